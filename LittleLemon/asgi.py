@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LittleLemon.settings')
+# Persistent connections are not reused under ASGI: each request's sync work
+# may open its own, and they pile up until CONN_MAX_AGE expires them. Use
+# DB_POOL or an external pooler instead.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+import django
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,11 +48,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'LittleLemonAPI.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'LittleLemonAPI.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -77,13 +83,114 @@ WSGI_APPLICATION = 'LittleLemon.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# The default is the bundled SQLite file. Set DB_ENGINE (plus DB_NAME, DB_USER,
+# DB_PASSWORD, DB_HOST, DB_PORT) to move to a server database; DB_POOL=1 turns
+# on driver-level pooling where the backend supports it (psycopg 3 on
+# Django 5.1+), otherwise point DB_HOST at a pooler such as PgBouncer.
+# DB_CONN_MAX_AGE keeps connections open between requests under WSGI;
+# LittleLemon.asgi turns it off, since ASGI does not reuse them.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'django.db.backends.sqlite3')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': DB_ENGINE,
+        'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
 }
 
+if DB_ENGINE == 'django.db.backends.sqlite3':
+    # Seconds a connection waits on a locked database before raising.
+    DATABASES['default']['OPTIONS']['timeout'] = 20
+    if django.VERSION >= (5, 1):
+        # Take the write lock when a transaction starts, so a checkout never
+        # has to upgrade a read lock while another writer holds the database.
+        DATABASES['default']['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+else:
+    DATABASES['default'].update({
+        'USER': os.environ.get('DB_USER', ''),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
+    })
+    if os.environ.get('DB_POOL'):
+        DATABASES['default']['OPTIONS']['pool'] = True
+        # Pooled connections are returned to the pool instead of being kept.
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# Read replica. Safe-method reads are routed here by
+# LittleLemonAPI.routers.PrimaryReplicaRouter; locally DB_REPLICA_NAME can
+# point at a second SQLite file kept in sync with the primary.
+if os.environ.get('DB_REPLICA_NAME') or os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        NAME=os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        OPTIONS=dict(DATABASES['default']['OPTIONS']),
+        TEST={'MIRROR': 'default'},
+    )
+    if 'HOST' in DATABASES['default']:
+        DATABASES['replica']['HOST'] = os.environ.get('DB_REPLICA_HOST', DATABASES['default']['HOST'])
+
+DATABASE_ROUTERS = ['LittleLemonAPI.routers.PrimaryReplicaRouter']
+
+# Applied to every new SQLite connection by LittleLemonAPI.signals.
+SQLITE_PRAGMAS = {
+    'mmap_size': 134217728,
+    'busy_timeout': 20000,
+}
+
+# WAL is recorded in the database file itself, so it is only switched on for
+# a database named through DB_NAME; the bundled db.sqlite3 stays as committed.
+if os.environ.get('DB_NAME'):
+    SQLITE_PRAGMAS.update({
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+    })
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+# State every worker process has to agree on (role and token lookups,
+# throttle counters and the other shared aliases below) lives in Redis at
+# CACHE_REDIS_URL, e.g. unix:///run/redis/redis.sock. Process-local caches
+# are only accepted with DEBUG on, i.e. under the single-process development
+# server.
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+
+if not CACHE_REDIS_URL and not DEBUG:
+    raise ImproperlyConfigured('CACHE_REDIS_URL must point at the Redis shared by every worker.')
+
+# The read-your-writes flag set by ReplicaRoutingMiddleware has to be seen by
+# whichever worker serves the client's next read.
+if not CACHE_REDIS_URL and 'replica' in DATABASES:
+    raise ImproperlyConfigured('CACHE_REDIS_URL is required when a read replica is configured.')
+
+def shared_cache(prefix, **options):
+    if CACHE_REDIS_URL:
+        return dict(options, BACKEND='django.core.cache.backends.redis.RedisCache', LOCATION=CACHE_REDIS_URL, KEY_PREFIX=prefix)
+    return dict(options, BACKEND='django.core.cache.backends.locmem.LocMemCache', LOCATION=prefix)
+
+CACHES = {
+    'default': shared_cache('default'),
+    'catalogue': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalogue',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+    # Shared, so deleting a token on logout revokes it on every worker.
+    'auth': shared_cache('auth', TIMEOUT=60),
+    # Throttle counters rely on Redis INCR being atomic, so every worker
+    # enforces one limit.
+    'throttle': shared_cache('throttle'),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -127,13 +234,23 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'LittleLemonAPI.renderers.FastJSONRenderer',
+    ) + (('rest_framework.renderers.BrowsableAPIRenderer',) if DEBUG else ()),
+    'DEFAULT_PARSER_CLASSES': (
+        'LittleLemonAPI.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'LittleLemonAPI.authentication.CachingTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_THROTTLE_RATES': {
         'anon': '2/minute',
-        'user': '5/minute'
+        'user': '5/minute',
+        'menu-items': '5/minute',
+        'orders': '5/minute'
     }
 }
 
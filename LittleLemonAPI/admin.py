@@ -1,8 +1,14 @@
 from django.contrib import admin
-from .models import Category, MenuItem, Cart, Order, OrderItem
+from .models import Category, MenuItem, Cart, CartSummary, Order, OrderItem, Job, DailyRevenue, DailyItemSales, CrewStatusCount, CrewQueueChange
 
 admin.site.register(Category)
 admin.site.register(MenuItem)
 admin.site.register(Cart)
+admin.site.register(CartSummary)
 admin.site.register(Order)
 admin.site.register(OrderItem)
+admin.site.register(Job)
+admin.site.register(DailyRevenue)
+admin.site.register(DailyItemSales)
+admin.site.register(CrewStatusCount)
+admin.site.register(CrewQueueChange)
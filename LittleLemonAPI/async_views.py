@@ -0,0 +1,36 @@
+from asyncio import iscoroutinefunction
+from asgiref.sync import sync_to_async
+from rest_framework.views import APIView
+
+class AsyncAPIView(APIView):
+    # An APIView whose handlers may be coroutines. Authentication, permission
+    # and throttle checks (DRF's initial()) and any synchronous handlers run in
+    # the sync_to_async thread; async handlers run on the event loop and use
+    # the async ORM. Under WSGI Django drives the view with async_to_sync.
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
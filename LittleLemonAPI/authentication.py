@@ -0,0 +1,22 @@
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+TOKEN_CACHE_ALIAS = "auth"
+
+def token_cache_key(key):
+    return "auth_token:{}".format(key)
+
+def invalidate_token(key):
+    caches[TOKEN_CACHE_ALIAS].delete(token_cache_key(key))
+
+class CachingTokenAuthentication(TokenAuthentication):
+    # Keeps the token (with its user attached) in the shared TTL cache so warm
+    # requests authenticate without the Token + User join. Group names are
+    # resolved separately through the shared, invalidated role cache.
+    def authenticate_credentials(self, key):
+        cache = caches[TOKEN_CACHE_ALIAS]
+        token = cache.get(token_cache_key(key))
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(token_cache_key(key), token)
+        return (token.user, token)
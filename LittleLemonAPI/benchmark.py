@@ -0,0 +1,403 @@
+import asyncio
+import json
+import math
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import django
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import AsyncClient, Client
+from rest_framework import serializers
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from .instrumentation import registry
+from .models import Category, MenuItem, Order
+from .renderers import FastJSONRenderer
+from .roles import MANAGER_GROUP, DELIVERY_CREW_GROUP, CUSTOMER_GROUP
+from .serializers import OrderSerializer
+
+# Seeded users are named <prefix><n>; the runner finds its tokens this way.
+USERNAME_PREFIXES = {
+    MANAGER_GROUP: "bench_manager_",
+    DELIVERY_CREW_GROUP: "bench_crew_",
+    CUSTOMER_GROUP: "bench_customer_",
+}
+SPARE_USERS = 64
+MICRO_PAGE_SIZE = 100
+
+class BenchmarkError(Exception):
+    pass
+
+Request = namedtuple("Request", ["method", "path", "role", "data", "expect"])
+
+def request(method, path, role, data=None, expect=200):
+    return Request(method, path, role, data, expect)
+
+class BenchmarkContext:
+    # Ids and tokens the scenarios need, resolved once before the run.
+    def __init__(self):
+        self.tokens = {}
+        for role, prefix in USERNAME_PREFIXES.items():
+            tokens = list(
+                Token.objects.filter(user__username__startswith=prefix)
+                .order_by("user_id")
+                .values_list("key", "user_id")
+            )
+            if not tokens:
+                raise BenchmarkError("No {} tokens found; run seed_benchmark first.".format(role))
+            self.tokens[role] = tokens
+        self.menu_item_ids = list(MenuItem.objects.order_by("id").values_list("id", flat=True)[:1000])
+        self.category_id = Category.objects.order_by("id").values_list("id", flat=True).first()
+        self.customer_orders = self.first_orders(CUSTOMER_GROUP, "user_id")
+        self.crew_orders = self.first_orders(DELIVERY_CREW_GROUP, "delivery_crew_id")
+        self.spare_users = list(
+            User.objects.filter(username__startswith=USERNAME_PREFIXES[CUSTOMER_GROUP], auth_token__isnull=True)
+            .order_by("id")
+            .values_list("id", "username")[:SPARE_USERS]
+        )
+        self.export_day = Order.objects.order_by("-date").values_list("date", flat=True).first()
+        if not (self.menu_item_ids and self.customer_orders and self.crew_orders and self.spare_users):
+            raise BenchmarkError("The benchmark dataset is incomplete; re-seed it with seed_benchmark.")
+
+    def first_orders(self, role, field):
+        orders = []
+        for _, user_id in self.tokens[role]:
+            order_id = Order.objects.filter(**{field: user_id}).order_by("id").values_list("id", flat=True).first()
+            if order_id is not None:
+                orders.append(order_id)
+        return orders
+
+    def token(self, role, worker):
+        tokens = self.tokens[role]
+        return tokens[worker % len(tokens)][0]
+
+    def user_id(self, role, worker):
+        tokens = self.tokens[role]
+        return tokens[worker % len(tokens)][1]
+
+    def menu_item(self, index):
+        return self.menu_item_ids[index % len(self.menu_item_ids)]
+
+    def order_page(self):
+        return list(OrderSerializer.setup_eager_loading(Order.objects.order_by("-id"))[:MICRO_PAGE_SIZE])
+
+# Scenarios are generators: they yield a Request and get the response back,
+# so one definition drives both the WSGI and the ASGI client. Read-only
+# scenarios come first because the write scenarios change the dataset.
+SCENARIOS = {}
+
+def scenario(name):
+    def decorator(func):
+        SCENARIOS[name] = func
+        return func
+    return decorator
+
+@scenario("menu-items.list")
+def menu_items_list(ctx, worker, iteration):
+    yield request("get", "/api/menu-items?perpage=20&page={}".format(iteration % 10 + 1), CUSTOMER_GROUP)
+
+@scenario("menu-items.list-cursor")
+def menu_items_list_cursor(ctx, worker, iteration):
+    yield request("get", "/api/menu-items?pagination=cursor&perpage=20&ordering=price", CUSTOMER_GROUP)
+
+@scenario("menu-items.detail")
+def menu_items_detail(ctx, worker, iteration):
+    yield request("get", "/api/menu-items/{}".format(ctx.menu_item(iteration)), CUSTOMER_GROUP)
+
+@scenario("categories.list")
+def categories_list(ctx, worker, iteration):
+    yield request("get", "/api/categories", CUSTOMER_GROUP)
+
+@scenario("groups.managers")
+def groups_managers(ctx, worker, iteration):
+    yield request("get", "/api/groups/manager/users/?perpage=50", MANAGER_GROUP)
+
+@scenario("groups.delivery-crew")
+def groups_delivery_crew(ctx, worker, iteration):
+    yield request("get", "/api/groups/delivery-crew/users/?perpage=50", MANAGER_GROUP)
+
+@scenario("cart.summary")
+def cart_summary(ctx, worker, iteration):
+    yield request("get", "/api/cart/summary", CUSTOMER_GROUP)
+
+@scenario("orders.list-customer")
+def orders_list_customer(ctx, worker, iteration):
+    yield request("get", "/api/orders?perpage=20", CUSTOMER_GROUP)
+
+@scenario("orders.list-crew")
+def orders_list_crew(ctx, worker, iteration):
+    yield request("get", "/api/orders?perpage=20", DELIVERY_CREW_GROUP)
+
+@scenario("orders.list-manager")
+def orders_list_manager(ctx, worker, iteration):
+    yield request("get", "/api/orders?perpage=20&page={}".format(iteration % 10 + 1), MANAGER_GROUP)
+
+@scenario("orders.list-manager-cursor")
+def orders_list_manager_cursor(ctx, worker, iteration):
+    yield request("get", "/api/orders?pagination=cursor&perpage=20&ordering=-date", MANAGER_GROUP)
+
+@scenario("orders.detail")
+def orders_detail(ctx, worker, iteration):
+    yield request("get", "/api/orders/{}".format(ctx.customer_orders[worker % len(ctx.customer_orders)]), CUSTOMER_GROUP)
+
+@scenario("orders.queue")
+def orders_queue(ctx, worker, iteration):
+    response = yield request("get", "/api/orders/queue", DELIVERY_CREW_GROUP)
+    yield request("get", "/api/orders/queue?since={}".format(response.json()["token"]), DELIVERY_CREW_GROUP)
+
+@scenario("orders.export")
+def orders_export(ctx, worker, iteration):
+    yield request("get", "/api/orders/export?from={0}&to={0}".format(ctx.export_day), MANAGER_GROUP)
+
+@scenario("analytics")
+def analytics(ctx, worker, iteration):
+    yield request("get", "/api/analytics/revenue", MANAGER_GROUP)
+    yield request("get", "/api/analytics/menu-items?perpage=20", MANAGER_GROUP)
+    yield request("get", "/api/analytics/crew", MANAGER_GROUP)
+
+@scenario("metrics")
+def metrics(ctx, worker, iteration):
+    yield request("get", "/api/metrics", MANAGER_GROUP)
+    yield request("get", "/api/metrics/slow", MANAGER_GROUP)
+
+@scenario("menu-items.write")
+def menu_items_write(ctx, worker, iteration):
+    data = {
+        "title": "Bench special {}-{}".format(worker, iteration),
+        "price": "9.99",
+        "featured": False,
+        "category": ctx.category_id,
+    }
+    response = yield request("post", "/api/menu-items", MANAGER_GROUP, data, expect=201)
+    path = "/api/menu-items/{}".format(response.json()["id"])
+    yield request("patch", path, MANAGER_GROUP, {"price": "10.99"})
+    yield request("delete", path, MANAGER_GROUP)
+
+@scenario("groups.membership")
+def groups_membership(ctx, worker, iteration):
+    user_id, username = ctx.spare_users[(worker + iteration) % len(ctx.spare_users)]
+    for group in ("manager", "delivery-crew"):
+        yield request("post", "/api/groups/{}/users/".format(group), MANAGER_GROUP, {"username": username}, expect=201)
+        yield request("delete", "/api/groups/{}/users/{}".format(group, user_id), MANAGER_GROUP)
+
+@scenario("cart.write")
+def cart_write(ctx, worker, iteration):
+    first, second = ctx.menu_item(iteration), ctx.menu_item(iteration + 1)
+    # PUT replaces whatever an earlier, interrupted run left in the cart.
+    yield request("put", "/api/cart/menu-items/bulk", CUSTOMER_GROUP, [{"menuitem": first, "quantity": 1}])
+    yield request("post", "/api/cart/menu-items", CUSTOMER_GROUP, {"menuitem": second, "quantity": 2}, expect=201)
+    yield request("get", "/api/cart/menu-items", CUSTOMER_GROUP)
+    yield request("get", "/api/cart/summary", CUSTOMER_GROUP)
+    yield request("delete", "/api/cart/menu-items", CUSTOMER_GROUP)
+
+@scenario("orders.checkout")
+def orders_checkout(ctx, worker, iteration):
+    # Every worker checks out as its own customer, so concurrency here means
+    # parallel writers contending for the database.
+    items = [{"menuitem": ctx.menu_item(iteration + offset), "quantity": offset + 1} for offset in range(3)]
+    yield request("put", "/api/cart/menu-items/bulk", CUSTOMER_GROUP, items)
+    yield request("post", "/api/orders", CUSTOMER_GROUP, expect=201)
+
+@scenario("orders.update")
+def orders_update(ctx, worker, iteration):
+    path = "/api/orders/{}".format(ctx.crew_orders[worker % len(ctx.crew_orders)])
+    yield request("patch", path, DELIVERY_CREW_GROUP, {"status": iteration % 2 == 0})
+    data = {"delivery_crew": ctx.user_id(DELIVERY_CREW_GROUP, worker), "status": False}
+    yield request("put", path, MANAGER_GROUP, data)
+
+MICRO_BENCHMARKS = {}
+
+def micro_benchmark(name):
+    def decorator(func):
+        MICRO_BENCHMARKS[name] = func
+        return func
+    return decorator
+
+@micro_benchmark("serializer.orders-page.fast")
+def serialize_orders_fast(ctx):
+    orders = ctx.order_page()
+    return lambda: OrderSerializer(orders, many=True).data
+
+@micro_benchmark("serializer.orders-page.drf")
+def serialize_orders_drf(ctx):
+    orders = ctx.order_page()
+    return lambda: serializers.ListSerializer(orders, child=OrderSerializer()).data
+
+@micro_benchmark("renderer.orders-page.fast")
+def render_orders_fast(ctx):
+    data = OrderSerializer(ctx.order_page(), many=True).data
+    renderer = FastJSONRenderer()
+    return lambda: renderer.render(data)
+
+@micro_benchmark("renderer.orders-page.drf")
+def render_orders_drf(ctx):
+    data = OrderSerializer(ctx.order_page(), many=True).data
+    renderer = JSONRenderer()
+    return lambda: renderer.render(data)
+
+def consume(response):
+    if response.streaming:
+        b"".join(response.streaming_content)
+    return response
+
+def request_kwargs(req):
+    if req.data is None:
+        return {}
+    return {"data": json.dumps(req.data), "content_type": "application/json"}
+
+def async_auth(token):
+    # AsyncClient only accepts a headers mapping from Django 4.2 on; before
+    # that, headers are passed straight into the ASGI scope.
+    if django.VERSION >= (4, 2):
+        return {"headers": {"Authorization": "Token " + token}}
+    return {"headers": [(b"authorization", ("Token " + token).encode())]}
+
+def unexpected(req, response):
+    return "{} {} returned {}, expected {}".format(req.method.upper(), req.path, response.status_code, req.expect)
+
+def drive(client, steps, ctx, worker):
+    response = None
+    try:
+        while True:
+            req = steps.send(response)
+            response = consume(getattr(client, req.method)(
+                req.path, HTTP_AUTHORIZATION="Token " + ctx.token(req.role, worker), **request_kwargs(req)
+            ))
+            if response.status_code != req.expect:
+                steps.close()
+                return unexpected(req, response)
+    except StopIteration:
+        return None
+
+async def adrive(client, steps, ctx, worker):
+    response = None
+    try:
+        while True:
+            req = steps.send(response)
+            response = await getattr(client, req.method)(
+                req.path, **async_auth(ctx.token(req.role, worker)), **request_kwargs(req)
+            )
+            if response.streaming:
+                # Streaming bodies here are sync iterators that hit the database.
+                await sync_to_async(consume)(response)
+            if response.status_code != req.expect:
+                steps.close()
+                return unexpected(req, response)
+    except StopIteration:
+        return None
+
+def split(iterations, concurrency):
+    return [iterations // concurrency + (1 if worker < iterations % concurrency else 0) for worker in range(concurrency)]
+
+def run_wsgi(ctx, func, iterations, concurrency):
+    def work(worker, count):
+        client = Client()
+        samples, errors = [], []
+        try:
+            for iteration in range(count):
+                start = time.perf_counter()
+                try:
+                    error = drive(client, func(ctx, worker, iteration), ctx, worker)
+                except Exception as exc:
+                    error = repr(exc)
+                samples.append(time.perf_counter() - start)
+                if error:
+                    errors.append(error)
+        finally:
+            connections.close_all()
+        return samples, errors
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(work, worker, count) for worker, count in enumerate(split(iterations, concurrency))]
+        return [future.result() for future in futures]
+
+def run_asgi(ctx, func, iterations, concurrency):
+    async def work(worker, count):
+        client = AsyncClient()
+        samples, errors = [], []
+        for iteration in range(count):
+            start = time.perf_counter()
+            try:
+                error = await adrive(client, func(ctx, worker, iteration), ctx, worker)
+            except Exception as exc:
+                error = repr(exc)
+            samples.append(time.perf_counter() - start)
+            if error:
+                errors.append(error)
+        return samples, errors
+
+    async def main():
+        return await asyncio.gather(*(work(worker, count) for worker, count in enumerate(split(iterations, concurrency))))
+
+    return asyncio.run(main())
+
+DRIVERS = {"wsgi": run_wsgi, "asgi": run_asgi}
+
+def percentile(samples, percent):
+    if not samples:
+        return 0
+    return samples[max(0, math.ceil(percent / 100 * len(samples)) - 1)]
+
+def summarize(samples, errors, elapsed, requests=None, queries=None):
+    samples = sorted(samples)
+    requests = len(samples) if requests is None else requests
+    return {
+        "iterations": len(samples),
+        "requests": requests,
+        "errors": len(errors),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "rps": requests / elapsed if elapsed else 0,
+        "queries_per_request": queries / requests if queries is not None and requests else None,
+    }
+
+def run_scenario(ctx, name, client, iterations, concurrency):
+    driver = DRIVERS[client]
+    # One untimed iteration per worker fills the auth, role and catalogue
+    # caches, so the measured query counts are stable from run to run.
+    driver(ctx, SCENARIOS[name], concurrency, concurrency)
+    registry.reset()
+    start = time.perf_counter()
+    results = driver(ctx, SCENARIOS[name], iterations, concurrency)
+    elapsed = time.perf_counter() - start
+    samples = [sample for worker_samples, _ in results for sample in worker_samples]
+    errors = [error for _, worker_errors in results for error in worker_errors]
+    # Request and query counts come from the instrumentation middleware, which
+    # sees every request a scenario makes, including the ones on async views.
+    with registry.lock:
+        requests = sum(h.count for (metric, _), h in registry.histograms.items() if metric == "request_queries")
+        queries = sum(h.sum for (metric, _), h in registry.histograms.items() if metric == "request_queries")
+    return summarize(samples, errors, elapsed, requests, queries), errors
+
+def run_micro_benchmark(ctx, name, iterations):
+    func = MICRO_BENCHMARKS[name](ctx)
+    for _ in range(min(iterations, 10)):
+        func()
+    samples = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        began = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - began)
+    return summarize(samples, [], time.perf_counter() - start)
+
+def find_regressions(results, baseline, threshold):
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append("{}: p95 {:.2f}ms -> {:.2f}ms".format(name, previous["p95_ms"], current["p95_ms"]))
+        if current["rps"] < previous["rps"] * (1 - threshold):
+            regressions.append("{}: {:.1f} -> {:.1f} requests/s".format(name, previous["rps"], current["rps"]))
+        # Cache hit rates move the average a little between runs; one extra
+        # query per request, let alone an N+1, still crosses this margin.
+        if current["queries_per_request"] is not None and previous.get("queries_per_request") is not None and \
+                current["queries_per_request"] > previous["queries_per_request"] + max(0.5, previous["queries_per_request"] * threshold):
+            regressions.append("{}: {:.2f} -> {:.2f} queries/request".format(
+                name, previous["queries_per_request"], current["queries_per_request"]))
+    return regressions
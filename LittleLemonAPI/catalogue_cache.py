@@ -0,0 +1,84 @@
+import time
+from urllib.parse import urlencode
+from functools import wraps
+from django.core.cache import cache, caches
+from rest_framework import status
+from rest_framework.response import Response
+from .conditional import make_etag
+from .routers import use_primary
+
+CATALOGUE_CACHE_ALIAS = "catalogue"
+CATALOGUE_VERSION_KEY = "catalogue:version"
+CATALOGUE_QUERY_PARAMS = ("category", "to_price", "search", "ordering", "page", "perpage", "pagination", "cursor")
+CATALOGUE_CACHED_HEADERS = ("Link",)
+
+def get_catalogue_version():
+    # The version lives in the default cache, which is shared by every worker
+    # (see CACHE_REDIS_URL), so a bump retires the rendered entries each
+    # worker keeps in its fast per-process catalogue cache.
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old version.
+        cache.add(CATALOGUE_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(CATALOGUE_VERSION_KEY)
+    return version
+
+async def aget_catalogue_version():
+    version = await cache.aget(CATALOGUE_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CATALOGUE_VERSION_KEY, int(time.time() * 1000), None)
+        version = await cache.aget(CATALOGUE_VERSION_KEY)
+    return version
+
+def bump_catalogue_version():
+    try:
+        cache.incr(CATALOGUE_VERSION_KEY)
+    except ValueError:
+        get_catalogue_version()
+
+def catalogue_cache_key(request, resource, version):
+    params = sorted(
+        (name, value)
+        for name in CATALOGUE_QUERY_PARAMS
+        for value in request.query_params.getlist(name)
+    )
+    return "catalogue:{}:{}:{}".format(version, resource, urlencode(params))
+
+def acatalogue_validators(resource):
+    async def get_validators(view, request, *args, **kwargs):
+        version = await aget_catalogue_version()
+        return make_etag(catalogue_cache_key(request, resource.format(**kwargs), version)), None
+    return get_validators
+
+def cached_response(cached):
+    data, headers = cached
+    response = Response(data, status=status.HTTP_200_OK)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+def response_cache_entry(response):
+    headers = {header: response[header] for header in CATALOGUE_CACHED_HEADERS if response.has_header(header)}
+    return (response.data, headers)
+
+def cache_catalogue_response(resource):
+    # Only wraps the async catalogue views.
+    def decorator_cache_catalogue_response(func):
+        @wraps(func)
+        async def wrapper(view, request, *args, **kwargs):
+            version = await aget_catalogue_version()
+            key = catalogue_cache_key(request, resource.format(**kwargs), version)
+            catalogue_cache = caches[CATALOGUE_CACHE_ALIAS]
+            cached = await catalogue_cache.aget(key)
+            if cached is not None:
+                return cached_response(cached)
+            # The entry is stored under a version bumped when the primary
+            # committed; filling it from a lagging replica would pin the old
+            # rows to the new version.
+            with use_primary():
+                response = await func(view, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                await catalogue_cache.aset(key, response_cache_entry(response))
+            return response
+        return wrapper
+    return decorator_cache_catalogue_response
@@ -0,0 +1,62 @@
+import hashlib
+from asyncio import iscoroutinefunction
+from functools import wraps
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+def make_etag(*parts):
+    return hashlib.md5(":".join(str(part) for part in parts).encode()).hexdigest()
+
+def normalize_validators(validators):
+    etag, last_modified = validators
+    etag = quote_etag(etag) if etag else None
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+    return etag, last_modified
+
+def is_not_modified(request, etag, last_modified):
+    return get_conditional_response(request, etag=etag, last_modified=last_modified) is not None
+
+def set_validators(response, etag, last_modified):
+    if etag:
+        response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
+
+def conditional_response(get_validators):
+    # get_validators(view, request, *args, **kwargs) returns (etag, last_modified)
+    # or None; a matching If-None-Match/If-Modified-Since short-circuits with 304
+    # before the view queries or serializes anything. Async views take async
+    # validators.
+    def decorator_conditional_response(func):
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(view, request, *args, **kwargs):
+                validators = await get_validators(view, request, *args, **kwargs)
+                if validators is None:
+                    return await func(view, request, *args, **kwargs)
+                etag, last_modified = normalize_validators(validators)
+                if is_not_modified(request, etag, last_modified):
+                    return set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+                response = await func(view, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                return set_validators(response, etag, last_modified)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(view, request, *args, **kwargs):
+            validators = get_validators(view, request, *args, **kwargs)
+            if validators is None:
+                return func(view, request, *args, **kwargs)
+            etag, last_modified = normalize_validators(validators)
+            if is_not_modified(request, etag, last_modified):
+                return set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+            response = func(view, request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            return set_validators(response, etag, last_modified)
+        return wrapper
+    return decorator_conditional_response
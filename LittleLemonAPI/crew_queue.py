@@ -0,0 +1,102 @@
+import asyncio
+import time
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Max, Min
+from .models import CrewQueueChange, CrewQueueLock
+
+# A queue token is a position in the CrewQueueChange log: a client that
+# passes it back as `since` gets every change logged after it. That only
+# holds if change ids become visible in increasing order, so a token never
+# skips a change that commits later with a smaller id. SQLite serialises
+# writers; server databases hand out ids at insert time and may commit them
+# out of order, so there writers take the CrewQueueLock row first.
+
+QUEUE_VERSION_KEY = "crew_queue:{}:version"
+# The version lives in the shared default cache. It expires so that a lost or
+# out-of-order write is corrected from the database within this many seconds.
+QUEUE_VERSION_TIMEOUT = 10
+MAX_CHANGES = 100
+MAX_WAIT_SECONDS = 30
+# Waiting clients check the cache, not the database, this often.
+POLL_INTERVAL = 0.5
+
+def queue_version_key(crew_id):
+    return QUEUE_VERSION_KEY.format(crew_id)
+
+def lock_queue_changes():
+    if connections[router.db_for_write(CrewQueueChange)].vendor != "sqlite":
+        CrewQueueLock.objects.select_for_update().get_or_create(id=1)
+
+def record_queue_change(crew_id, order_id, is_open):
+    lock_queue_changes()
+    change = CrewQueueChange.objects.create(delivery_crew_id=crew_id, order_id=order_id, open=is_open)
+    # Waiters are only woken once the change is visible to their query.
+    transaction.on_commit(lambda: cache.set(queue_version_key(crew_id), change.id, QUEUE_VERSION_TIMEOUT))
+
+def record_order_queue_changes(order, delivery_crew_id, status):
+    # delivery_crew_id and status are the values before the update.
+    if delivery_crew_id is not None and delivery_crew_id != order.delivery_crew_id:
+        record_queue_change(delivery_crew_id, order.id, False)
+    if order.delivery_crew_id is not None and (
+            order.delivery_crew_id != delivery_crew_id or bool(order.status) != bool(status)):
+        record_queue_change(order.delivery_crew_id, order.id, not order.status)
+
+def record_order_queue_removed(order):
+    if order.delivery_crew_id is not None:
+        record_queue_change(order.delivery_crew_id, order.id, False)
+
+def prune_queue_changes(before):
+    # The newest change is always kept: it marks the current position, so a
+    # token from before the pruned range is still recognised as expired.
+    latest = CrewQueueChange.objects.aggregate(latest=Max("id"))["latest"]
+    if latest is None:
+        return 0
+    deleted, _ = CrewQueueChange.objects.filter(created_at__lt=before, id__lt=latest).delete()
+    return deleted
+
+async def aget_queue_position():
+    return (await CrewQueueChange.objects.aaggregate(latest=Max("id")))["latest"] or 0
+
+async def ais_token_expired(since):
+    oldest = (await CrewQueueChange.objects.aaggregate(oldest=Min("id")))["oldest"]
+    return oldest is not None and since < oldest - 1
+
+async def aget_queue_version(crew_id):
+    version = await cache.aget(queue_version_key(crew_id))
+    if version is None:
+        latest = await CrewQueueChange.objects.filter(delivery_crew_id=crew_id).aaggregate(latest=Max("id"))
+        await cache.aadd(queue_version_key(crew_id), latest["latest"] or 0, QUEUE_VERSION_TIMEOUT)
+        version = await cache.aget(queue_version_key(crew_id))
+    return version
+
+async def await_queue_change(crew_id, since, timeout):
+    deadline = time.monotonic() + timeout
+    while await aget_queue_version(crew_id) <= since:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        await asyncio.sleep(min(POLL_INTERVAL, remaining))
+
+def open_orders(queryset, crew_id):
+    return queryset.filter(delivery_crew_id=crew_id, status=False).order_by("id")
+
+async def aget_queue_changes(queryset, crew_id, since):
+    # Returns the next token, the orders that are open now and the ids of
+    # orders that left the queue since `since`.
+    position = await aget_queue_position()
+    changes = [
+        change async for change in CrewQueueChange.objects.filter(delivery_crew_id=crew_id, id__gt=since)
+        .order_by("id").only("id", "order_id", "open")[:MAX_CHANGES]
+    ]
+    if len(changes) == MAX_CHANGES:
+        # The client catches up over several polls.
+        position = changes[-1].id
+    latest = {change.order_id: change.open for change in changes}
+    opened = [order_id for order_id, is_open in latest.items() if is_open]
+    orders = [order async for order in open_orders(queryset, crew_id).filter(id__in=opened)] if opened else []
+    # An order logged as open may have closed again after `position`; the
+    # later change reaches the client on its next poll.
+    still_open = {order.id for order in orders}
+    removed = sorted(order_id for order_id in latest if order_id not in still_open)
+    return position, orders, removed
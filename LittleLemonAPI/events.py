@@ -0,0 +1,45 @@
+from collections import defaultdict
+from django.utils import timezone
+from .models import Job
+
+ORDER_CREATED = "order.created"
+ORDER_ASSIGNED = "order.assigned"
+ORDER_STATUS_CHANGED = "order.status_changed"
+
+_handlers = defaultdict(list)
+
+def subscribe(event):
+    # Handlers receive a list of payloads so a worker can hand them a whole
+    # batch of jobs for the same event at once.
+    def decorator(handler):
+        _handlers[event].append(handler)
+        return handler
+    return decorator
+
+def get_handlers(event):
+    return list(_handlers.get(event, ()))
+
+def publish(event, **payload):
+    # The job row is written on the caller's connection, so inside an atomic
+    # block it only becomes visible to workers once the transaction commits
+    # and disappears with it on rollback.
+    return Job.objects.create(event=event, payload=payload, run_after=timezone.now())
+
+def order_payload(order):
+    return {
+        "order_id": order.id,
+        "user_id": order.user_id,
+        "delivery_crew_id": order.delivery_crew_id,
+        "status": bool(order.status),
+    }
+
+def publish_order_created(order):
+    payload = order_payload(order)
+    payload["total"] = str(order.total)
+    publish(ORDER_CREATED, **payload)
+
+def publish_order_changes(order, delivery_crew_id, status):
+    if order.delivery_crew_id != delivery_crew_id:
+        publish(ORDER_ASSIGNED, previous_delivery_crew_id=delivery_crew_id, **order_payload(order))
+    if bool(order.status) != bool(status):
+        publish(ORDER_STATUS_CHANGED, previous_status=bool(status), **order_payload(order))
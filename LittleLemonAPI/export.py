@@ -0,0 +1,60 @@
+import csv
+from django.core.serializers.json import DjangoJSONEncoder
+
+EXPORT_CHUNK_SIZE = 2000
+
+CSV_HEADER = [
+    "order_id", "date", "user_id", "username", "delivery_crew", "status", "total",
+    "menuitem", "quantity", "unit_price", "price",
+]
+
+class Echo:
+    # csv.writer only needs write(); hand each formatted line straight back.
+    def write(self, value):
+        return value
+
+def iter_export_orders(queryset):
+    return (
+        queryset.select_related("user")
+        .prefetch_related("order_item")
+        .order_by("date", "id")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+def order_to_dict(order):
+    return {
+        "id": order.id,
+        "user": {"id": order.user_id, "username": order.user.username},
+        "delivery_crew": order.delivery_crew_id,
+        "status": order.status,
+        "total": order.total,
+        "date": order.date,
+        "order_item": [
+            {
+                "menuitem": item.menuitem_id,
+                "quantity": item.quantity,
+                "unit_price": item.unit_price,
+                "price": item.price,
+            }
+            for item in order.order_item.all()
+        ],
+    }
+
+def stream_ndjson(queryset):
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    for order in iter_export_orders(queryset):
+        yield encoder.encode(order_to_dict(order)) + "\n"
+
+def stream_csv(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for order in iter_export_orders(queryset):
+        columns = [
+            order.id, order.date.isoformat(), order.user_id, order.user.username,
+            order.delivery_crew_id or "", order.status, order.total,
+        ]
+        items = order.order_item.all()
+        if not items:
+            yield writer.writerow(columns + ["", "", "", ""])
+        for item in items:
+            yield writer.writerow(columns + [item.menuitem_id, item.quantity, item.unit_price, item.price])
@@ -0,0 +1,87 @@
+from datetime import date, timedelta
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from .search import MAX_QUERY_LENGTH, search_menu_items
+
+class QueryFilter:
+    # Declares which query parameters a list endpoint accepts: `filters` maps a
+    # parameter to (ORM lookup, field used to validate it) and `ordering_fields`
+    # lists the indexed columns clients may sort on.
+    filters = {}
+    ordering_fields = ()
+
+    def __init__(self, query_params):
+        errors = {}
+        self.filter_kwargs = {}
+        for param, (lookup, field) in self.filters.items():
+            value = query_params.get(param)
+            if not value:
+                continue
+            try:
+                self.filter_kwargs[lookup] = field.run_validation(value)
+            except ValidationError as exc:
+                errors[param] = exc.detail
+        self.ordering = []
+        ordering = query_params.get("ordering")
+        if ordering:
+            for name in ordering.split(","):
+                if name.lstrip("-") not in self.ordering_fields:
+                    errors["ordering"] = ["Ordering by '{}' is not allowed. Choose from: {}.".format(
+                        name, ", ".join(self.ordering_fields))]
+                    break
+                self.ordering.append(name)
+        if errors:
+            raise ValidationError(errors)
+
+    def filter_queryset(self, queryset):
+        return queryset.filter(**self.filter_kwargs)
+
+class MenuItemFilter(QueryFilter):
+    filters = {
+        "category": ("category__title", serializers.CharField()),
+        "to_price": ("price__lte", serializers.DecimalField(max_digits=None, decimal_places=None)),
+        "search": ("search", serializers.CharField(max_length=MAX_QUERY_LENGTH)),
+    }
+    ordering_fields = ("id", "title", "price", "featured")
+
+    def __init__(self, query_params):
+        super().__init__(query_params)
+        self.search = self.filter_kwargs.pop("search", None)
+        if self.search is not None and not self.ordering:
+            # Best matches first unless the client asked for another order.
+            self.ordering = ["search_rank"]
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.search is not None:
+            queryset = search_menu_items(queryset, self.search)
+        return queryset
+
+class OrderFilter(QueryFilter):
+    filters = {
+        "user": ("user__username", serializers.CharField()),
+        "delivery_crew": ("delivery_crew__username", serializers.CharField()),
+        "to_total": ("total__lte", serializers.DecimalField(max_digits=None, decimal_places=None)),
+        "status": ("status", serializers.BooleanField()),
+    }
+    ordering_fields = ("id", "date", "status")
+
+class OrderExportFilter(QueryFilter):
+    filters = {
+        "from": ("date__gte", serializers.DateField()),
+        "to": ("date__lte", serializers.DateField()),
+    }
+
+class AnalyticsFilter(QueryFilter):
+    filters = {
+        "from": ("date__gte", serializers.DateField()),
+        "to": ("date__lte", serializers.DateField()),
+    }
+    default_days = 30
+
+    def __init__(self, query_params):
+        super().__init__(query_params)
+        # Always bound both ends: an open range lets SQLite group by the
+        # menuitem index and scan the whole table instead of the date range.
+        self.filter_kwargs.setdefault("date__lte", date.today())
+        self.filter_kwargs.setdefault("date__gte", self.filter_kwargs["date__lte"] - timedelta(days=self.default_days - 1))
@@ -0,0 +1,289 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+# A statement repeated this many times in one request is reported as a
+# duplicate; the usual cause is a per-row lookup (N+1) inside a loop.
+DUPLICATE_QUERY_THRESHOLD = 2
+
+METRICS = {
+    "request_duration_seconds": ("histogram", "Wall time spent handling a request.", DURATION_BUCKETS),
+    "request_queries": ("histogram", "ORM queries executed per request.", QUERY_COUNT_BUCKETS),
+    "request_query_duration_seconds": ("histogram", "Time spent in ORM queries per request.", DURATION_BUCKETS),
+    "request_serializer_duration_seconds": ("histogram", "Time spent building serializer data per request.", DURATION_BUCKETS),
+    "response_size_bytes": ("histogram", "Size of non-streaming response bodies.", SIZE_BUCKETS),
+    "requests_total": ("counter", "Requests handled, by response status.", None),
+    "duplicate_queries_total": ("counter", "Repeated executions of the same SQL statement within a request.", None),
+}
+METRIC_PREFIX = "littlelemon_"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_recorder = ContextVar("request_recorder", default=None)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+    def quantile(self, q):
+        # Upper bound of the bucket the quantile falls in, as Prometheus'
+        # histogram_quantile would report it without interpolation.
+        rank = q * self.count
+        for bound, total in self.cumulative_counts():
+            if total >= rank:
+                return bound
+        return float("inf")
+
+    def mean(self):
+        return self.sum / self.count if self.count else 0
+
+class MetricsRegistry:
+    # Metrics live in process memory, so every worker process exposes its own
+    # series; the scraper is expected to aggregate across instances.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = Counter()
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    def increment(self, name, labels, amount=1):
+        with self.lock:
+            self.counters[(name, labels)] += amount
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def render_prometheus(self):
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            metric = METRIC_PREFIX + name
+            lines.append("# HELP {} {}".format(metric, help_text))
+            lines.append("# TYPE {} {}".format(metric, kind))
+            if kind == "histogram":
+                for (series, labels), histogram in histograms:
+                    if series != name:
+                        continue
+                    for bound, total in histogram.cumulative_counts():
+                        le = "+Inf" if bound == float("inf") else format_value(bound)
+                        lines.append("{}_bucket{} {}".format(metric, format_labels(labels + (("le", le),)), total))
+                    lines.append("{}_sum{} {}".format(metric, format_labels(labels), format_value(histogram.sum)))
+                    lines.append("{}_count{} {}".format(metric, format_labels(labels), histogram.count))
+            else:
+                for (series, labels), value in counters:
+                    if series == name:
+                        lines.append("{}{} {}".format(metric, format_labels(labels), value))
+        return "\n".join(lines) + "\n"
+
+    def slow_endpoints(self, quantile=0.95):
+        with self.lock:
+            histograms = dict(self.histograms)
+            counters = dict(self.counters)
+        report = []
+        for (name, labels), duration in histograms.items():
+            if name != "request_duration_seconds":
+                continue
+            queries = histograms.get(("request_queries", labels))
+            query_time = histograms.get(("request_query_duration_seconds", labels))
+            serializer_time = histograms.get(("request_serializer_duration_seconds", labels))
+            report.append({
+                **dict(labels),
+                "requests": duration.count,
+                "mean_seconds": duration.mean(),
+                "p{:g}_seconds".format(quantile * 100): duration.quantile(quantile),
+                "mean_queries": queries.mean() if queries else 0,
+                "mean_query_seconds": query_time.mean() if query_time else 0,
+                "mean_serializer_seconds": serializer_time.mean() if serializer_time else 0,
+                "duplicate_queries": counters.get(("duplicate_queries_total", labels), 0),
+            })
+        report.sort(key=lambda row: (row["p{:g}_seconds".format(quantile * 100)], row["mean_seconds"]), reverse=True)
+        return report
+
+registry = MetricsRegistry()
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ('{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"')) for key, value in labels)
+    return "{" + ",".join(pairs) + "}"
+
+class RequestRecorder:
+    def __init__(self):
+        self.query_count = 0
+        self.query_time = 0.0
+        self.serializer_time = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_time += time.perf_counter() - start
+            self.query_count += 1
+            self.statements[sql] += 1
+
+    def duplicates(self):
+        return {sql: count for sql, count in self.statements.items() if count >= DUPLICATE_QUERY_THRESHOLD}
+
+def record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+def install_query_recorder(connection):
+    # Installed once per connection rather than per request with
+    # connection.execute_wrapper(), because async views run their queries on
+    # a different thread, and so a different connection object, than the
+    # middleware. The recorder itself travels with the request's context.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+@contextmanager
+def record_serializer_time():
+    recorder = _recorder.get()
+    if recorder is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.serializer_time += time.perf_counter() - start
+
+def get_view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    view_class = getattr(match.func, "view_class", None)
+    return view_class.__name__ if view_class is not None else match.func.__name__
+
+def record_request(request, response, recorder, duration):
+    labels = (("view", get_view_name(request)), ("method", request.method))
+    registry.observe("request_duration_seconds", labels, duration)
+    registry.observe("request_queries", labels, recorder.query_count)
+    registry.observe("request_query_duration_seconds", labels, recorder.query_time)
+    registry.observe("request_serializer_duration_seconds", labels, recorder.serializer_time)
+    if not response.streaming:
+        registry.observe("response_size_bytes", labels, len(response.content))
+    registry.increment("requests_total", labels + (("status", response.status_code),))
+    duplicates = recorder.duplicates()
+    if duplicates:
+        registry.increment("duplicate_queries_total", labels, sum(count - 1 for count in duplicates.values()))
+        # duplicate_queries_total is what to alert on; the statements
+        # themselves are only worth logging while tracking one down.
+        for sql, count in duplicates.items():
+            logger.debug("%s %s ran the same query %d times: %s", labels[0][1], request.method, count, sql)
+
+def record_stream(request, response, recorder, start):
+    # A streaming body runs its queries while the server iterates it, after
+    # the middleware has returned, so the recorder is put back in place around
+    # each chunk and the request is recorded once the stream is exhausted or
+    # closed.
+    content = response.streaming_content
+
+    def chunks():
+        try:
+            while True:
+                token = _recorder.set(recorder)
+                try:
+                    chunk = next(content)
+                except StopIteration:
+                    return
+                finally:
+                    _recorder.reset(token)
+                yield chunk
+        finally:
+            record_request(request, response, recorder, time.perf_counter() - start)
+
+    async def achunks():
+        try:
+            while True:
+                token = _recorder.set(recorder)
+                try:
+                    chunk = await anext(content)
+                except StopAsyncIteration:
+                    return
+                finally:
+                    _recorder.reset(token)
+                yield chunk
+        finally:
+            record_request(request, response, recorder, time.perf_counter() - start)
+
+    response.streaming_content = achunks() if getattr(response, "is_async", False) else chunks()
+    return response
+
+def finish_request(request, response, recorder, start):
+    if response.streaming:
+        return record_stream(request, response, recorder, start)
+    record_request(request, response, recorder, time.perf_counter() - start)
+    return response
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = RequestRecorder()
+        token = _recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return finish_request(request, response, recorder, start)
+
+    async def __acall__(self, request):
+        recorder = RequestRecorder()
+        token = _recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return finish_request(request, response, recorder, start)
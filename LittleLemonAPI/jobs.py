@@ -0,0 +1,98 @@
+import logging
+import traceback
+from datetime import timedelta
+from itertools import groupby
+from django.db import close_old_connections, connections
+from django.db.models import F, Q
+from django.utils import timezone
+from .events import get_handlers
+from .models import Job
+from .routers import use_primary
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 2
+MAX_RETRY_SECONDS = 300
+# A running job whose worker has not finished it within the lease is assumed
+# lost (crashed process) and becomes claimable again.
+LEASE_SECONDS = 300
+
+def claimable(now):
+    return (Q(status=Job.PENDING, run_after__lte=now) |
+            Q(status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=LEASE_SECONDS)))
+
+def claim_jobs(worker_id, batch_size=BATCH_SIZE):
+    now = timezone.now()
+    ids = list(
+        Job.objects.filter(claimable(now))
+        .order_by("run_after", "id")
+        .values_list("id", flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    # Re-checking the claim condition in the UPDATE makes it the arbiter when
+    # two workers picked the same candidates: only one of them wins each row.
+    Job.objects.filter(claimable(now), id__in=ids).update(
+        status=Job.RUNNING,
+        locked_by=worker_id,
+        locked_at=now,
+        attempts=F("attempts") + 1
+    )
+    return list(Job.objects.filter(id__in=ids, status=Job.RUNNING, locked_by=worker_id, locked_at=now).order_by("event", "id"))
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_SECONDS ** attempts, MAX_RETRY_SECONDS))
+
+def leased(jobs):
+    # A worker whose lease ran out may finish after another worker reclaimed
+    # the job; only the current holder of the lease records the outcome.
+    condition = Q(id__in=[])
+    for job in jobs:
+        condition |= Q(id=job.id, locked_by=job.locked_by, locked_at=job.locked_at)
+    return Job.objects.filter(condition)
+
+def complete_jobs(jobs):
+    leased(jobs).delete()
+
+def fail_jobs(jobs, error, max_attempts=MAX_ATTEMPTS):
+    now = timezone.now()
+    for job in jobs:
+        if job.attempts >= max_attempts:
+            leased([job]).update(
+                status=Job.FAILED, locked_by="", locked_at=None, last_error=error
+            )
+        else:
+            leased([job]).update(
+                status=Job.PENDING, locked_by="", locked_at=None, last_error=error,
+                run_after=now + retry_delay(job.attempts)
+            )
+
+def run_jobs(jobs, max_attempts=MAX_ATTEMPTS):
+    for event, batch in groupby(jobs, key=lambda job: job.event):
+        batch = list(batch)
+        try:
+            for handler in get_handlers(event):
+                handler([job.payload for job in batch])
+        except Exception:
+            logger.exception("Handler for %s failed on %d job(s)", event, len(batch))
+            fail_jobs(batch, traceback.format_exc(), max_attempts)
+        else:
+            complete_jobs(batch)
+
+def work_once(worker_id, batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    with use_primary():
+        jobs = claim_jobs(worker_id, batch_size)
+        run_jobs(jobs, max_attempts)
+    return len(jobs)
+
+def work(worker_id, stop_event, batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS, poll_interval=1.0):
+    try:
+        while not stop_event.is_set():
+            close_old_connections()
+            if not work_once(worker_id, batch_size, max_attempts):
+                stop_event.wait(poll_interval)
+    finally:
+        # Worker threads own their connections; don't leave them to the GC.
+        connections.close_all()
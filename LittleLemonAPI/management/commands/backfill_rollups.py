@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from LittleLemonAPI.models import CrewStatusCount, DailyItemSales, DailyRevenue
+from LittleLemonAPI.rollups import rebuild_rollups
+
+class Command(BaseCommand):
+    help = "Rebuilds the analytics rollup tables from the order history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        rebuild_rollups(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS("Rebuilt {} daily revenue, {} daily item sales and {} crew status rows.".format(
+            DailyRevenue.objects.count(), DailyItemSales.objects.count(), CrewStatusCount.objects.count())))
@@ -0,0 +1,16 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from LittleLemonAPI.crew_queue import prune_queue_changes
+
+class Command(BaseCommand):
+    help = "Deletes crew queue changes older than the retention period; older tokens then expire."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7)
+
+    def handle(self, *args, **options):
+        if options["days"] < 1:
+            raise CommandError("--days must be positive.")
+        deleted = prune_queue_changes(timezone.now() - timedelta(days=options["days"]))
+        self.stdout.write(self.style.SUCCESS("Deleted {} crew queue changes.".format(deleted)))
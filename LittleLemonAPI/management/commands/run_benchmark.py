@@ -0,0 +1,104 @@
+import json
+import platform
+from datetime import datetime, timezone
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from LittleLemonAPI.benchmark import (
+    DRIVERS, MICRO_BENCHMARKS, SCENARIOS, BenchmarkContext, BenchmarkError,
+    find_regressions, run_micro_benchmark, run_scenario,
+)
+
+# High enough never to trigger, while keeping the throttle's cache round trip
+# in the measured path.
+UNTHROTTLED_RATE = "1000000/second"
+
+class Command(BaseCommand):
+    help = "Drives every API route against the seeded dataset and compares the results with a baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200, help="Iterations per scenario.")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--client", choices=["wsgi", "asgi", "both"], default="wsgi")
+        parser.add_argument("--scenario", action="append", default=[], help="Only run scenarios starting with this name.")
+        parser.add_argument("--skip-micro", action="store_true", help="Skip the serializer and renderer microbenchmarks.")
+        parser.add_argument("--list", action="store_true", help="List scenarios and exit.")
+        parser.add_argument("--baseline", default="benchmark_baseline.json")
+        parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline.")
+        parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative slowdown before failing.")
+        parser.add_argument("--keep-throttling", action="store_true", help="Run with the configured throttle rates.")
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            for name in list(SCENARIOS) + ["micro:" + name for name in MICRO_BENCHMARKS]:
+                self.stdout.write(name)
+            return
+        if options["iterations"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--iterations and --concurrency must be positive.")
+        clients = list(DRIVERS) if options["client"] == "both" else [options["client"]]
+        names = [
+            name for name in SCENARIOS
+            if not options["scenario"] or any(name.startswith(prefix) for prefix in options["scenario"])
+        ]
+        overrides = {"ALLOWED_HOSTS": list(settings.ALLOWED_HOSTS) + ["testserver"]}
+        if not options["keep_throttling"]:
+            rest_framework = dict(settings.REST_FRAMEWORK)
+            rest_framework["DEFAULT_THROTTLE_RATES"] = {
+                scope: UNTHROTTLED_RATE for scope in rest_framework.get("DEFAULT_THROTTLE_RATES", {})
+            }
+            overrides["REST_FRAMEWORK"] = rest_framework
+        results = {}
+        failures = []
+        with override_settings(**overrides):
+            try:
+                ctx = BenchmarkContext()
+            except BenchmarkError as exc:
+                raise CommandError(str(exc))
+            for client in clients:
+                for name in names:
+                    key = "{}:{}".format(client, name)
+                    results[key], errors = run_scenario(ctx, name, client, options["iterations"], options["concurrency"])
+                    self.report(key, results[key])
+                    if errors:
+                        failures.append("{}: {} failed iteration(s), e.g. {}".format(key, len(errors), errors[0]))
+            if not options["skip_micro"] and not options["scenario"]:
+                for name in MICRO_BENCHMARKS:
+                    key = "micro:" + name
+                    results[key] = run_micro_benchmark(ctx, name, options["iterations"])
+                    self.report(key, results[key])
+
+        baseline = None
+        try:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            pass
+        regressions = find_regressions(results, baseline, options["threshold"]) if baseline else []
+        if options["save_baseline"]:
+            with open(options["baseline"], "w") as f:
+                json.dump({"environment": self.environment(options), "results": results}, f, indent=2, sort_keys=True)
+            self.stdout.write("Baseline written to {}.".format(options["baseline"]))
+        for failure in failures + regressions:
+            self.stderr.write(failure)
+        if failures or regressions:
+            raise CommandError("{} failing scenario(s), {} regression(s).".format(len(failures), len(regressions)))
+        self.stdout.write(self.style.SUCCESS("No regressions." if baseline else "No baseline to compare against."))
+
+    def report(self, key, result):
+        queries = result["queries_per_request"]
+        self.stdout.write("{:<40} p50 {:>8.2f}ms  p95 {:>8.2f}ms  p99 {:>8.2f}ms  {:>9.1f} req/s  {}".format(
+            key, result["p50_ms"], result["p95_ms"], result["p99_ms"], result["rps"],
+            "{:.1f} queries/req".format(queries) if queries is not None else ""
+        ))
+
+    def environment(self, options):
+        return {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "iterations": options["iterations"],
+            "concurrency": options["concurrency"],
+        }
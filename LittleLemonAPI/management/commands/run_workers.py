@@ -0,0 +1,55 @@
+import os
+import socket
+import threading
+from django.core.management.base import BaseCommand, CommandError
+from LittleLemonAPI.jobs import BATCH_SIZE, MAX_ATTEMPTS, work, work_once
+
+class Command(BaseCommand):
+    help = "Runs a pool of workers that process queued order events."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS)
+        parser.add_argument("--poll-interval", type=float, default=1.0)
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit.")
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--workers and --batch-size must be positive.")
+        prefix = "{}:{}".format(socket.gethostname(), os.getpid())
+        if options["once"]:
+            processed = 0
+            while True:
+                count = work_once(prefix, options["batch_size"], options["max_attempts"])
+                if not count:
+                    break
+                processed += count
+            self.stdout.write("Processed {} job(s).".format(processed))
+            return
+        stop_event = threading.Event()
+        threads = [
+            threading.Thread(
+                target=work,
+                args=("{}:{}".format(prefix, index), stop_event),
+                kwargs={
+                    "batch_size": options["batch_size"],
+                    "max_attempts": options["max_attempts"],
+                    "poll_interval": options["poll_interval"],
+                },
+                daemon=True
+            )
+            for index in range(options["workers"])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write("Started {} worker(s).".format(len(threads)))
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=1.0)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping workers...")
+            stop_event.set()
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,172 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from rest_framework.authtoken.models import Token
+from LittleLemonAPI.benchmark import USERNAME_PREFIXES
+from LittleLemonAPI.catalogue_cache import bump_catalogue_version
+from LittleLemonAPI.models import Category, MenuItem, Order, OrderItem
+from LittleLemonAPI.rollups import rebuild_rollups
+from LittleLemonAPI.roles import MANAGER_GROUP, DELIVERY_CREW_GROUP, CUSTOMER_GROUP
+
+def next_id(model):
+    return (model.objects.aggregate(max_id=Max("id"))["max_id"] or 0) + 1
+
+def batched(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class Command(BaseCommand):
+    help = "Seeds a reproducible benchmark dataset with bulk inserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--categories", type=int, default=1000)
+        parser.add_argument("--menu-items", type=int, default=5000)
+        parser.add_argument("--users", type=int, default=100000)
+        parser.add_argument("--managers", type=int, default=20)
+        parser.add_argument("--delivery-crew", type=int, default=500)
+        parser.add_argument("--orders", type=int, default=1000000)
+        parser.add_argument("--items-per-order", type=int, default=3, help="Average number of lines per order.")
+        parser.add_argument("--token-users", type=int, default=16, help="Users per role that get an API token.")
+        parser.add_argument("--days", type=int, default=365, help="Spread order dates over this many days.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--password", default="benchmark")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        customers = options["users"] - options["managers"] - options["delivery_crew"]
+        if min(options["categories"], options["menu_items"], options["managers"], options["delivery_crew"],
+               options["orders"], options["items_per_order"], options["token_users"], options["batch_size"]) < 1:
+            raise CommandError("All sizes must be positive.")
+        if customers < options["token_users"]:
+            raise CommandError("--users must leave at least --token-users customers.")
+        if User.objects.filter(username__startswith="bench_").exists():
+            raise CommandError("Benchmark data already exists; seed a fresh database (see DB_NAME).")
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        menu_prices = self.seed_catalogue(options["categories"], options["menu_items"])
+        users = self.seed_users({
+            MANAGER_GROUP: options["managers"],
+            DELIVERY_CREW_GROUP: options["delivery_crew"],
+            CUSTOMER_GROUP: customers,
+        }, options["password"])
+        tokens = self.seed_tokens(users, options["token_users"])
+        self.seed_orders(
+            options["orders"], options["items_per_order"], options["days"], menu_prices,
+            users[CUSTOMER_GROUP], users[DELIVERY_CREW_GROUP], options["token_users"]
+        )
+        # bulk_create skips the signals that normally expire cached catalogue
+        # pages, and the views that keep the analytics rollups current.
+        bump_catalogue_version()
+        rebuild_rollups(self.batch_size)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Category, MenuItem, User, Order, OrderItem]):
+                cursor.execute(sql)
+            if connection.vendor == "sqlite":
+                # Refresh planner statistics gathered on the empty tables, so
+                # partial indexes such as the open-orders one get picked.
+                cursor.execute("ANALYZE")
+        for role, keys in tokens.items():
+            self.stdout.write("{} token: {}".format(role, keys[0]))
+        self.stdout.write(self.style.SUCCESS("Benchmark dataset seeded."))
+
+    def bulk_create(self, model, objs):
+        for batch in batched(objs, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+
+    def seed_catalogue(self, category_count, item_count):
+        # Ids are assigned here rather than read back from the database, which
+        # not every backend supports for bulk inserts.
+        first_category = next_id(Category)
+        self.bulk_create(Category, [
+            Category(id=first_category + i, slug="bench-category-{}".format(i), title="Bench Category {}".format(i))
+            for i in range(category_count)
+        ])
+        first_item = next_id(MenuItem)
+        menu_prices = {}
+        items = []
+        for i in range(item_count):
+            price = Decimal(self.rng.randint(100, 3000)) / 100
+            menu_prices[first_item + i] = price
+            items.append(MenuItem(
+                id=first_item + i,
+                title="Bench Item {}".format(i),
+                price=price,
+                featured=self.rng.random() < 0.1,
+                category_id=first_category + self.rng.randrange(category_count)
+            ))
+        self.bulk_create(MenuItem, items)
+        self.stdout.write("Seeded {} categories and {} menu items.".format(category_count, item_count))
+        return menu_prices
+
+    def seed_users(self, counts, password):
+        # Hashing is deliberately slow; every seeded user shares one hash.
+        password_hash = make_password(password)
+        next_user = next_id(User)
+        users = {}
+        for role, count in counts.items():
+            users[role] = list(range(next_user, next_user + count))
+            self.bulk_create(User, [
+                User(id=user_id, username="{}{}".format(USERNAME_PREFIXES[role], index),
+                     email="{}{}@example.com".format(USERNAME_PREFIXES[role], index), password=password_hash)
+                for index, user_id in enumerate(users[role])
+            ])
+            next_user += count
+            if role != CUSTOMER_GROUP:
+                group, _ = Group.objects.get_or_create(name=role)
+                self.bulk_create(User.groups.through, [
+                    User.groups.through(user_id=user_id, group_id=group.id) for user_id in users[role]
+                ])
+        self.stdout.write("Seeded {} users.".format(sum(counts.values())))
+        return users
+
+    def seed_tokens(self, users, token_users):
+        tokens = {role: [Token.generate_key() for _ in ids[:token_users]] for role, ids in users.items()}
+        self.bulk_create(Token, [
+            Token(key=key, user_id=user_id)
+            for role, keys in tokens.items()
+            for key, user_id in zip(keys, users[role])
+        ])
+        return tokens
+
+    def seed_orders(self, order_count, items_per_order, days, menu_prices, customers, crew, token_users):
+        menu_item_ids = list(menu_prices)
+        lines_per_order = min(2 * items_per_order - 1, len(menu_item_ids))
+        today = date.today()
+        next_order = next_id(Order)
+        created = 0
+        while created < order_count:
+            orders, lines = [], []
+            for offset in range(min(self.batch_size, order_count - created)):
+                index = created + offset
+                order_id = next_order + index
+                # The first orders go to the token holders so every benchmark
+                # customer and crew member has an order to read and update.
+                user_id = customers[index] if index < token_users else self.rng.choice(customers)
+                crew_id = crew[index % len(crew)] if index < token_users or self.rng.random() < 0.7 else None
+                total = Decimal(0)
+                for menu_item_id in self.rng.sample(menu_item_ids, self.rng.randint(1, lines_per_order)):
+                    quantity = self.rng.randint(1, 3)
+                    price = menu_prices[menu_item_id] * quantity
+                    total += price
+                    lines.append(OrderItem(order_id=order_id, menuitem_id=menu_item_id, quantity=quantity,
+                                           unit_price=menu_prices[menu_item_id], price=price))
+                orders.append(Order(
+                    id=order_id,
+                    user_id=user_id,
+                    delivery_crew_id=crew_id,
+                    status=crew_id is not None and self.rng.random() < 0.5,
+                    total=total,
+                    date=today - timedelta(days=self.rng.randrange(days))
+                ))
+            with transaction.atomic():
+                Order.objects.bulk_create(orders)
+                OrderItem.objects.bulk_create(lines, batch_size=self.batch_size)
+            created += len(orders)
+            self.stdout.write("Seeded {}/{} orders.".format(created, order_count))
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:56
+
+import sqlite3
+
+import LittleLemonAPI.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# The statements are spelled out here rather than imported from
+# LittleLemonAPI.search, so later changes to the app can't change what this
+# migration did.
+CREATE_SEARCH_INDEX = [
+    'CREATE VIRTUAL TABLE "LittleLemonAPI_menuitem_search" USING fts5(title, category, tokenize=\'trigram\')',
+    'INSERT INTO "LittleLemonAPI_menuitem_search"("LittleLemonAPI_menuitem_search", rank) '
+    'VALUES (\'rank\', \'bm25(10.0, 1.0)\')',
+    'INSERT INTO "LittleLemonAPI_menuitem_search"(rowid, title, category) '
+    'SELECT m.id, m.title, c.title FROM "LittleLemonAPI_menuitem" m '
+    'JOIN "LittleLemonAPI_category" c ON c.id = m.category_id',
+    'CREATE TRIGGER "LittleLemonAPI_menuitem_search_insert" AFTER INSERT ON "LittleLemonAPI_menuitem" BEGIN '
+    'INSERT INTO "LittleLemonAPI_menuitem_search"(rowid, title, category) VALUES '
+    '(new.id, new.title, (SELECT title FROM "LittleLemonAPI_category" WHERE id = new.category_id)); END',
+    'CREATE TRIGGER "LittleLemonAPI_menuitem_search_update" AFTER UPDATE OF id, title, category_id ON "LittleLemonAPI_menuitem" BEGIN '
+    'DELETE FROM "LittleLemonAPI_menuitem_search" WHERE rowid = old.id; '
+    'INSERT INTO "LittleLemonAPI_menuitem_search"(rowid, title, category) VALUES '
+    '(new.id, new.title, (SELECT title FROM "LittleLemonAPI_category" WHERE id = new.category_id)); END',
+    'CREATE TRIGGER "LittleLemonAPI_menuitem_search_delete" AFTER DELETE ON "LittleLemonAPI_menuitem" BEGIN '
+    'DELETE FROM "LittleLemonAPI_menuitem_search" WHERE rowid = old.id; END',
+    'CREATE TRIGGER "LittleLemonAPI_menuitem_search_category_update" AFTER UPDATE OF title ON "LittleLemonAPI_category" BEGIN '
+    'UPDATE "LittleLemonAPI_menuitem_search" SET category = new.title '
+    'WHERE rowid IN (SELECT id FROM "LittleLemonAPI_menuitem" WHERE category_id = new.id); END',
+]
+
+DROP_SEARCH_INDEX = [
+    'DROP TRIGGER IF EXISTS "LittleLemonAPI_menuitem_search_category_update"',
+    'DROP TRIGGER IF EXISTS "LittleLemonAPI_menuitem_search_delete"',
+    'DROP TRIGGER IF EXISTS "LittleLemonAPI_menuitem_search_update"',
+    'DROP TRIGGER IF EXISTS "LittleLemonAPI_menuitem_search_insert"',
+    'DROP TABLE IF EXISTS "LittleLemonAPI_menuitem_search"',
+]
+
+
+def run_statements(schema_editor, statements):
+    # The trigram tokenizer shipped with SQLite 3.34.
+    if schema_editor.connection.vendor != 'sqlite' or sqlite3.sqlite_version_info < (3, 34, 0):
+        return
+    for statement in statements:
+        schema_editor.execute(statement, params=None)
+
+
+def create_search_index(apps, schema_editor):
+    run_statements(schema_editor, CREATE_SEARCH_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    run_statements(schema_editor, DROP_SEARCH_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0007_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemSearch',
+            fields=[
+                ('menuitem', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='LittleLemonAPI.menuitem')),
+                ('title', models.TextField()),
+                ('category', models.TextField()),
+                ('document', LittleLemonAPI.search.SearchDocumentField(db_column='LittleLemonAPI_menuitem_search')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'LittleLemonAPI_menuitem_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def analyze_orders(apps, schema_editor):
+    # Without statistics SQLite prefers the plain delivery_crew index over the
+    # partial open-orders index and walks every delivered order.
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute('ANALYZE "LittleLemonAPI_order"', params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0009_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrewQueueChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('open', models.BooleanField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', False)), fields=['delivery_crew', 'id'], name='order_open_crew_idx'),
+        ),
+        migrations.AddField(
+            model_name='crewqueuechange',
+            name='delivery_crew',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='crewqueuechange',
+            name='order',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='LittleLemonAPI.order'),
+        ),
+        migrations.AddIndex(
+            model_name='crewqueuechange',
+            index=models.Index(fields=['delivery_crew', 'id'], name='crewqueue_crew_id_idx'),
+        ),
+        migrations.RunPython(analyze_orders, migrations.RunPython.noop),
+    ]
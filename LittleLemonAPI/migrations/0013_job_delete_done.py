@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:49
+
+from django.db import migrations, models
+
+
+def delete_done_jobs(apps, schema_editor):
+    apps.get_model('LittleLemonAPI', 'Job').objects.filter(status='done').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0012_crew_queue_lock'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(delete_done_jobs, migrations.RunPython.noop),
+    ]
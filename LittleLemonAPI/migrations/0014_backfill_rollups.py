@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def backfill_rollups(apps, schema_editor):
+    # The rollup tables were created empty; orders placed before 0009 would
+    # otherwise be decremented from rows that never counted them. This is the
+    # same aggregation as LittleLemonAPI.rollups.rebuild_rollups, kept here so
+    # later changes to that module don't alter the migration.
+    Order = apps.get_model('LittleLemonAPI', 'Order')
+    OrderItem = apps.get_model('LittleLemonAPI', 'OrderItem')
+    DailyRevenue = apps.get_model('LittleLemonAPI', 'DailyRevenue')
+    DailyItemSales = apps.get_model('LittleLemonAPI', 'DailyItemSales')
+    CrewStatusCount = apps.get_model('LittleLemonAPI', 'CrewStatusCount')
+    db = schema_editor.connection.alias
+    DailyRevenue.objects.using(db).all().delete()
+    DailyItemSales.objects.using(db).all().delete()
+    CrewStatusCount.objects.using(db).all().delete()
+    DailyRevenue.objects.using(db).bulk_create([
+        DailyRevenue(date=row['date'], order_count=row['order_count'], revenue=row['revenue'])
+        for row in Order.objects.using(db).values('date').annotate(order_count=Count('id'), revenue=Sum('total')).order_by()
+    ], batch_size=5000)
+    DailyItemSales.objects.using(db).bulk_create([
+        DailyItemSales(date=row['order__date'], menuitem_id=row['menuitem'], units=row['units'], revenue=row['revenue'])
+        for row in OrderItem.objects.using(db).values('order__date', 'menuitem').annotate(units=Sum('quantity'), revenue=Sum('price')).order_by()
+    ], batch_size=5000)
+    CrewStatusCount.objects.using(db).bulk_create([
+        CrewStatusCount(delivery_crew_id=row['delivery_crew'], status=row['status'], order_count=row['order_count'])
+        for row in Order.objects.using(db).values('delivery_crew', 'status').annotate(order_count=Count('id')).order_by()
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0013_job_delete_done'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
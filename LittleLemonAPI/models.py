@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from .search import SEARCH_TABLE, SearchDocumentField
 
 class Category(models.Model):
     slug = models.SlugField()
@@ -13,10 +14,28 @@ class MenuItem(models.Model):
     price = models.DecimalField(max_digits=6, decimal_places=2, db_index=True)
     featured = models.BooleanField(db_index=True)
     category = models.ForeignKey(Category, on_delete=models.PROTECT)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'price'], name='menuitem_category_price_idx'),
+        ]
     
     def __str__(self) -> str:
         return self.title
 
+class MenuItemSearch(models.Model):
+    # Read-only view of the FTS5 index the search migration creates and its
+    # triggers keep in step with MenuItem and Category writes.
+    menuitem = models.OneToOneField(MenuItem, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', related_name='search_entry')
+    title = models.TextField()
+    category = models.TextField()
+    document = SearchDocumentField(db_column=SEARCH_TABLE)
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = SEARCH_TABLE
+
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
@@ -30,6 +49,15 @@ class Cart(models.Model):
     def __str__(self) -> str:
         return "user: {}, menuitem: {}, quantity: {}, unit_price: {}, price: {}".format(self.user, self.menuitem, self.quantity, self.unit_price, self.price)
 
+
+class CartSummary(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    item_count = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    def __str__(self) -> str:
+        return "user: {}, item_count: {}, subtotal: {}".format(self.user, self.item_count, self.subtotal)
+
         
 class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -37,6 +65,19 @@ class Order(models.Model):
     status = models.BooleanField(db_index=True, default=0)
     total = models.DecimalField(max_digits=6, decimal_places=2)
     date = models.DateField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='order_user_date_idx'),
+            models.Index(fields=['delivery_crew', 'date'], name='order_crew_date_idx'),
+            # Boolean filters compile to WHERE "status" / NOT "status", which
+            # SQLite cannot look up in an index on the column. Partial indexes
+            # carry the same condition, so open orders (a small slice of the
+            # history) are read without touching delivered ones.
+            models.Index(fields=['date', 'id'], condition=models.Q(status=False), name='order_open_date_idx'),
+            models.Index(fields=['delivery_crew', 'id'], condition=models.Q(status=False), name='order_open_crew_idx'),
+        ]
     
     def __str__(self) -> str:
         return "user: {}, delivery_crew: {}, status: {}, total: {}, date: {}".format(self.user, self.delivery_crew, self.status, self.total, self.date)
@@ -49,4 +90,93 @@ class OrderItem(models.Model):
     price = models.DecimalField(max_digits=6, decimal_places=2)
 
     class Meta:
-        unique_together = ('order', 'menuitem')
\ No newline at end of file
+        unique_together = ('order', 'menuitem')
+
+class Job(models.Model):
+    # Finished jobs are deleted, so only pending, running and given-up jobs
+    # stay in the table.
+    PENDING = "pending"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (FAILED, "Failed"),
+    ]
+
+    event = models.CharField(max_length=100, db_index=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField()
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return "event: {}, status: {}, attempts: {}".format(self.event, self.status, self.attempts)
+
+
+class DailyRevenue(models.Model):
+    date = models.DateField(unique=True)
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self) -> str:
+        return "date: {}, order_count: {}, revenue: {}".format(self.date, self.order_count, self.revenue)
+
+class DailyItemSales(models.Model):
+    date = models.DateField()
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'menuitem')
+
+    def __str__(self) -> str:
+        return "date: {}, menuitem: {}, units: {}, revenue: {}".format(self.date, self.menuitem, self.units, self.revenue)
+
+class CrewStatusCount(models.Model):
+    delivery_crew = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
+    status = models.BooleanField(default=False)
+    order_count = models.IntegerField(default=0)
+
+    class Meta:
+        # Unassigned orders are counted under a NULL crew, which a plain
+        # unique constraint would not deduplicate.
+        constraints = [
+            models.UniqueConstraint(fields=['delivery_crew', 'status'], condition=models.Q(delivery_crew__isnull=False), name='crewstatus_crew_status_uniq'),
+            models.UniqueConstraint(fields=['status'], condition=models.Q(delivery_crew__isnull=True), name='crewstatus_unassigned_status_uniq'),
+        ]
+
+    def __str__(self) -> str:
+        return "delivery_crew: {}, status: {}, order_count: {}".format(self.delivery_crew, self.status, self.order_count)
+
+class CrewQueueChange(models.Model):
+    # One row per order entering or leaving a crew member's open queue. The
+    # ids double as the queue's change tokens.
+    delivery_crew = models.ForeignKey(User, on_delete=models.CASCADE)
+    # No constraint, so the removal of a deleted order outlives the order.
+    order = models.ForeignKey(Order, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    open = models.BooleanField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['delivery_crew', 'id'], name='crewqueue_crew_id_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return "delivery_crew: {}, order: {}, open: {}".format(self.delivery_crew_id, self.order_id, self.open)
+
+class CrewQueueLock(models.Model):
+    # A single row that every writer of CrewQueueChange locks first, so change
+    # ids commit in the order they were assigned.
+    pass
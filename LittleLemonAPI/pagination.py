@@ -0,0 +1,130 @@
+import base64
+import binascii
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.urls import replace_query_param
+
+DEFAULT_PERPAGE = 2
+MAX_PERPAGE = 100
+
+def get_perpage(request, default=DEFAULT_PERPAGE):
+    try:
+        perpage = int(request.query_params.get("perpage", default))
+    except (TypeError, ValueError):
+        raise ValidationError({"perpage": "A positive integer is required."})
+    if perpage < 1:
+        raise ValidationError({"perpage": "A positive integer is required."})
+    return min(perpage, MAX_PERPAGE)
+
+class KeysetPaginator:
+    # Pages on (ordering field, id) with an opaque cursor instead of COUNT/OFFSET.
+    cursor_query_param = "cursor"
+
+    def __init__(self, ordering="id", perpage=DEFAULT_PERPAGE):
+        self.descending = ordering.startswith("-")
+        self.field = ordering.lstrip("-")
+        self.perpage = perpage
+        self.next_cursor = None
+
+    def get_ordering(self):
+        prefix = "-" if self.descending else ""
+        if self.field == "id":
+            return [prefix + "id"]
+        return [prefix + self.field, prefix + "id"]
+
+    def encode_cursor(self, row):
+        position = [row.id]
+        if self.field != "id":
+            value = row
+            for attr in self.field.split("__"):
+                value = getattr(value, attr)
+            position.insert(0, value)
+        data = json.dumps(position, cls=DjangoJSONEncoder).encode()
+        return base64.urlsafe_b64encode(data).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise ValidationError({self.cursor_query_param: "Invalid cursor."})
+        expected = 1 if self.field == "id" else 2
+        if not isinstance(position, list) or len(position) != expected:
+            raise ValidationError({self.cursor_query_param: "Invalid cursor."})
+        return position
+
+    def filter_after(self, queryset, position):
+        lookup = "lt" if self.descending else "gt"
+        if self.field == "id":
+            return queryset.filter(**{"id__" + lookup: position[0]})
+        value, pk = position
+        return queryset.filter(
+            Q(**{self.field + "__" + lookup: value}) |
+            Q(**{self.field: value, "id__" + lookup: pk})
+        )
+
+    def get_page_queryset(self, queryset, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = self.filter_after(queryset, self.decode_cursor(cursor))
+        return queryset.order_by(*self.get_ordering())[:self.perpage + 1]
+
+    def trim_page(self, rows):
+        if len(rows) > self.perpage:
+            rows = rows[:self.perpage]
+            self.next_cursor = self.encode_cursor(rows[-1])
+        return rows
+
+    def paginate_queryset(self, queryset, request):
+        return self.trim_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        return self.trim_page([row async for row in self.get_page_queryset(queryset, request)])
+
+    def get_next_link(self, request):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def add_link_header(self, response, request):
+        next_link = self.get_next_link(request)
+        if next_link:
+            response["Link"] = '<{}>; rel="next"'.format(next_link)
+        return response
+
+def use_keyset_pagination(request):
+    return (request.query_params.get("pagination") == "cursor" or
+            KeysetPaginator.cursor_query_param in request.query_params)
+
+def get_page_number(request):
+    try:
+        page = int(request.query_params.get("page", 1))
+    except (TypeError, ValueError):
+        raise ValidationError({"page": "A positive integer is required."})
+    if page < 1:
+        raise ValidationError({"page": "A positive integer is required."})
+    return page
+
+def get_keyset_paginator(ordering_fields, perpage):
+    if len(ordering_fields) > 1:
+        raise ValidationError({"ordering": "Cursor pagination supports a single ordering field."})
+    return KeysetPaginator(ordering_fields[0] if ordering_fields else "id", perpage)
+
+def order_with_tiebreaker(queryset, ordering_fields):
+    if not any(field.lstrip("-") == "id" for field in ordering_fields):
+        ordering_fields = list(ordering_fields) + ["id"]
+    return queryset.order_by(*ordering_fields)
+
+async def apaginate_queryset(queryset, request, ordering_fields):
+    perpage = get_perpage(request)
+    if use_keyset_pagination(request):
+        paginator = get_keyset_paginator(ordering_fields, perpage)
+        return await paginator.apaginate_queryset(queryset, request), paginator
+    queryset = order_with_tiebreaker(queryset, ordering_fields)
+    page = get_page_number(request)
+    bottom = (page - 1) * perpage
+    # Mirrors Paginator.page(): the first page may be empty, later ones may not.
+    if page > 1 and bottom >= await queryset.acount():
+        return [], None
+    return [row async for row in queryset[bottom:bottom + perpage]], None
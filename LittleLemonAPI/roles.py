@@ -0,0 +1,61 @@
+from django.core.cache import cache
+
+MANAGER_GROUP = "Manager"
+DELIVERY_CREW_GROUP = "Delivery Crew"
+CUSTOMER_GROUP = "Customer"
+
+GROUP_NAMES_CACHE_TIMEOUT = 300
+
+def group_names_cache_key(user_id):
+    return "user_groups:{}".format(user_id)
+
+def get_group_names(user):
+    # Memoized on the user object so a request resolves roles at most once,
+    # and backed by the shared cache so warm requests skip the query entirely.
+    group_names = getattr(user, "_group_names", None)
+    if group_names is not None:
+        return group_names
+    if not user.is_authenticated:
+        group_names = frozenset()
+    else:
+        key = group_names_cache_key(user.id)
+        group_names = cache.get(key)
+        if group_names is None:
+            group_names = frozenset(user.groups.values_list("name", flat=True))
+            cache.set(key, group_names, GROUP_NAMES_CACHE_TIMEOUT)
+    user._group_names = group_names
+    return group_names
+
+async def aget_group_names(user):
+    group_names = getattr(user, "_group_names", None)
+    if group_names is not None:
+        return group_names
+    if not user.is_authenticated:
+        group_names = frozenset()
+    else:
+        key = group_names_cache_key(user.id)
+        group_names = await cache.aget(key)
+        if group_names is None:
+            group_names = frozenset([name async for name in user.groups.values_list("name", flat=True)])
+            await cache.aset(key, group_names, GROUP_NAMES_CACHE_TIMEOUT)
+    user._group_names = group_names
+    return group_names
+
+def invalidate_group_names(user):
+    cache.delete(group_names_cache_key(user.id))
+    if hasattr(user, "_group_names"):
+        del user._group_names
+
+def resolve_group(group_names):
+    if MANAGER_GROUP in group_names:
+        return MANAGER_GROUP
+    elif DELIVERY_CREW_GROUP in group_names:
+        return DELIVERY_CREW_GROUP
+    else:
+        return CUSTOMER_GROUP
+
+def get_group(user):
+    return resolve_group(get_group_names(user))
+
+async def aget_group(user):
+    return resolve_group(await aget_group_names(user))
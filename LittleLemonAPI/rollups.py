@@ -0,0 +1,101 @@
+from itertools import islice
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F, Sum
+from .models import CrewStatusCount, DailyItemSales, DailyRevenue, Order, OrderItem
+from .routers import use_primary
+
+# Rollups are adjusted in the same transaction as the order write, so the
+# analytics endpoints never see an order without its totals or vice versa.
+
+def increment(model, lookup, **deltas):
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # A concurrent writer created the row between our update and insert.
+        model.objects.filter(**lookup).update(**updates)
+
+def upsert_sql(connection, table, key_columns, delta_columns, rows):
+    qn = connection.ops.quote_name
+    columns = key_columns + delta_columns
+    values = ", ".join(["({})".format(", ".join(["%s"] * len(columns)))] * rows)
+    if connection.vendor == "mysql":
+        conflict = "ON DUPLICATE KEY UPDATE " + ", ".join(
+            "{0} = {0} + VALUES({0})".format(qn(column)) for column in delta_columns)
+    else:
+        conflict = "ON CONFLICT ({}) DO UPDATE SET {}".format(
+            ", ".join(qn(column) for column in key_columns),
+            ", ".join("{1} = {0}.{1} + excluded.{1}".format(qn(table), qn(column)) for column in delta_columns))
+    return "INSERT INTO {} ({}) VALUES {} {}".format(
+        qn(table), ", ".join(qn(column) for column in columns), values, conflict)
+
+def record_order_lines(order_date, lines, sign):
+    # The lines are summed per menu item and applied in one upsert, so a
+    # checkout costs the same single statement however many lines it has.
+    totals = {}
+    for line in lines:
+        units, revenue = totals.get(line.menuitem_id, (0, 0))
+        totals[line.menuitem_id] = (units + sign * line.quantity, revenue + sign * line.price)
+    if not totals:
+        return
+    connection = connections[router.db_for_write(DailyItemSales)]
+    fields = [DailyItemSales._meta.get_field(name) for name in ("date", "menuitem", "units", "revenue")]
+    params = []
+    for menuitem_id, (units, revenue) in totals.items():
+        for field, value in zip(fields, (order_date, menuitem_id, units, revenue)):
+            params.append(field.get_db_prep_save(value, connection))
+    sql = upsert_sql(connection, DailyItemSales._meta.db_table,
+                     [field.column for field in fields[:2]], [field.column for field in fields[2:]], len(totals))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+def record_order_created(order, lines):
+    increment(DailyRevenue, {"date": order.date}, order_count=1, revenue=order.total)
+    record_order_lines(order.date, lines, 1)
+    increment(CrewStatusCount, {"delivery_crew_id": order.delivery_crew_id, "status": bool(order.status)}, order_count=1)
+
+def record_order_changed(order, delivery_crew_id, status):
+    if order.delivery_crew_id == delivery_crew_id and bool(order.status) == bool(status):
+        return
+    increment(CrewStatusCount, {"delivery_crew_id": delivery_crew_id, "status": bool(status)}, order_count=-1)
+    increment(CrewStatusCount, {"delivery_crew_id": order.delivery_crew_id, "status": bool(order.status)}, order_count=1)
+
+def record_order_deleted(order, lines):
+    increment(DailyRevenue, {"date": order.date}, order_count=-1, revenue=-order.total)
+    record_order_lines(order.date, lines, -1)
+    increment(CrewStatusCount, {"delivery_crew_id": order.delivery_crew_id, "status": bool(order.status)}, order_count=-1)
+
+def bulk_create_batches(model, objs, batch_size):
+    # bulk_create() materialises its input; feeding it slices keeps a rebuild
+    # over millions of order lines in bounded memory.
+    objs = iter(objs)
+    while True:
+        batch = list(islice(objs, batch_size))
+        if not batch:
+            return
+        model.objects.bulk_create(batch)
+
+def rebuild_rollups(batch_size=5000):
+    # Rebuilt from the primary, since a lagging replica would write stale
+    # totals over the ones the order views keep current.
+    with use_primary(), transaction.atomic():
+        DailyRevenue.objects.all().delete()
+        DailyItemSales.objects.all().delete()
+        CrewStatusCount.objects.all().delete()
+        bulk_create_batches(DailyRevenue, (
+            DailyRevenue(date=row["date"], order_count=row["order_count"], revenue=row["revenue"])
+            for row in Order.objects.values("date").annotate(order_count=Count("id"), revenue=Sum("total"))
+            .order_by().iterator(chunk_size=batch_size)
+        ), batch_size)
+        bulk_create_batches(DailyItemSales, (
+            DailyItemSales(date=row["order__date"], menuitem_id=row["menuitem"], units=row["units"], revenue=row["revenue"])
+            for row in OrderItem.objects.values("order__date", "menuitem").annotate(units=Sum("quantity"), revenue=Sum("price"))
+            .order_by().iterator(chunk_size=batch_size)
+        ), batch_size)
+        bulk_create_batches(CrewStatusCount, (
+            CrewStatusCount(delivery_crew_id=row["delivery_crew"], status=row["status"], order_count=row["order_count"])
+            for row in Order.objects.values("delivery_crew", "status").annotate(order_count=Count("id")).order_by()
+        ), batch_size)
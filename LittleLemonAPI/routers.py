@@ -0,0 +1,92 @@
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+PRIMARY_DB = "default"
+REPLICA_DB = "replica"
+REPLICA_STICKY_SECONDS = 5
+
+_use_primary = ContextVar("use_primary", default=False)
+
+def replica_configured():
+    return REPLICA_DB in settings.DATABASES
+
+@contextmanager
+def use_primary():
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+class PrimaryReplicaRouter:
+    # Reads go to the replica unless the current request (or a recent write by
+    # the same client) pinned it to the primary; writes always go to primary.
+    def db_for_read(self, model, **hints):
+        if not replica_configured() or _use_primary.get():
+            return PRIMARY_DB
+        return REPLICA_DB
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {PRIMARY_DB, REPLICA_DB}:
+            return True
+        return None
+
+def sticky_cache_key(request):
+    # Keyed on the credentials the client sends, because the router has to
+    # decide before DRF has authenticated the request.
+    credentials = request.META.get("HTTP_AUTHORIZATION") or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credentials:
+        return None
+    return "db_sticky:{}".format(hashlib.sha1(credentials.encode()).hexdigest())
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+    safe_methods = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def pin_to_primary(self, request, key):
+        if request.method not in self.safe_methods:
+            return True
+        return key is not None and cache.get(key) is not None
+
+    def remember_write(self, request, response, key):
+        if key is not None and request.method not in self.safe_methods and response.status_code < 400:
+            cache.set(key, True, REPLICA_STICKY_SECONDS)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replica_configured():
+            return self.get_response(request)
+        key = sticky_cache_key(request)
+        token = _use_primary.set(self.pin_to_primary(request, key))
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_primary.reset(token)
+        self.remember_write(request, response, key)
+        return response
+
+    async def __acall__(self, request):
+        if not replica_configured():
+            return await self.get_response(request)
+        key = sticky_cache_key(request)
+        token = _use_primary.set(self.pin_to_primary(request, key))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _use_primary.reset(token)
+        self.remember_write(request, response, key)
+        return response
@@ -0,0 +1,99 @@
+import sqlite3
+from itertools import combinations
+from django.db import connections, models
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+SEARCH_TABLE = "LittleLemonAPI_menuitem_search"
+MIN_TRIGRAM_LENGTH = 3
+# Longer words add quadratically many trigram pairs without making a typo
+# any easier to find; the cut-off prefix still matches as a substring.
+MAX_WORD_LENGTH = 16
+MAX_QUERY_LENGTH = 100
+# A typo in a word this short leaves fewer than two intact trigrams, so one
+# shared trigram is enough for it to match.
+SHORT_WORD_LENGTH = 5
+
+def fts_supported(connection):
+    # The trigram tokenizer shipped with SQLite 3.34.
+    return connection.vendor == "sqlite" and sqlite3.sqlite_version_info >= (3, 34, 0)
+
+class SearchDocumentField(models.TextField):
+    # Stands for FTS5's hidden column named after the table, which matches
+    # against every indexed column at once.
+    pass
+
+@SearchDocumentField.register_lookup
+class Match(models.Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return "{} MATCH {}".format(lhs, rhs), lhs_params + rhs_params
+
+def quote(term):
+    return '"{}"'.format(term.replace('"', '""'))
+
+def trigrams(word):
+    seen = []
+    for i in range(len(word) - MIN_TRIGRAM_LENGTH + 1):
+        trigram = word[i:i + MIN_TRIGRAM_LENGTH]
+        if trigram not in seen:
+            seen.append(trigram)
+    return seen
+
+def search_words(text):
+    return [word[:MAX_WORD_LENGTH] for word in text.casefold().split() if len(word) >= MIN_TRIGRAM_LENGTH]
+
+def build_exact_query(words):
+    return " AND ".join(quote(word) for word in words)
+
+def required_trigrams(word):
+    return 1 if len(word) <= SHORT_WORD_LENGTH else 2
+
+def build_fuzzy_query(words):
+    # A word matches when the document shares enough of its trigrams to
+    # survive a single typo; closer spellings share more trigrams and rank
+    # higher under bm25.
+    groups = []
+    for word in words:
+        terms = [quote(word)]
+        terms += [
+            "(" + " AND ".join(quote(trigram) for trigram in combination) + ")"
+            for combination in combinations(trigrams(word), required_trigrams(word))
+        ]
+        groups.append("(" + " OR ".join(terms) + ")")
+    return " AND ".join(groups)
+
+class FallbackMatchQuery(models.Expression):
+    # Picks the exact substring query when it matches anything and the fuzzy
+    # one otherwise, inside the same statement. Correctly spelled searches
+    # then skip the far more expensive trigram-pair query.
+    output_field = models.TextField()
+
+    def __init__(self, exact, fuzzy):
+        super().__init__()
+        self.exact = exact
+        self.fuzzy = fuzzy
+
+    def as_sql(self, compiler, connection):
+        sql = 'CASE WHEN EXISTS (SELECT 1 FROM "{0}" WHERE "{0}" MATCH %s) THEN %s ELSE %s END'.format(SEARCH_TABLE)
+        return sql, [self.exact, self.exact, self.fuzzy]
+
+def search_menu_items(queryset, text):
+    # Annotates search_rank (lower is better) for the list view to order by.
+    words = search_words(text)
+    if words and fts_supported(connections[queryset.db]):
+        match_query = FallbackMatchQuery(build_exact_query(words), build_fuzzy_query(words))
+        return queryset.filter(search_entry__document__match=match_query).annotate(search_rank=F("search_entry__rank"))
+    # Backends without FTS5, and queries too short for trigrams, fall back to
+    # a case-insensitive substring match with prefix matches ranked first.
+    words = text.split()
+    condition = Q()
+    for word in words:
+        condition &= Q(title__icontains=word) | Q(category__title__icontains=word)
+    return queryset.filter(condition).annotate(search_rank=Case(
+        When(title__istartswith=words[0], then=Value(0)),
+        default=Value(1),
+        output_field=IntegerField()
+    ))
@@ -1,28 +1,159 @@
-from rest_framework import serializers
+from decimal import Decimal
+from operator import attrgetter
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 from django.contrib.auth.models import User
-from .models import MenuItem, Cart, Order, OrderItem, Category
+from .models import MenuItem, Cart, CartSummary, Order, OrderItem, Category, DailyRevenue, CrewStatusCount
+from .instrumentation import record_serializer_time
+from .crew_queue import MAX_WAIT_SECONDS
 
-class UserSerializer(serializers.ModelSerializer):
+def get_related_lookups(serializer, prefix="", in_prefetch=False):
+    select_related = []
+    prefetch_related = []
+    for field in serializer.fields.values():
+        if field.write_only or field.source == "*":
+            continue
+        lookup = prefix + field.source.replace(".", "__")
+        if isinstance(field, serializers.ListSerializer):
+            prefetch_related.append(lookup)
+            child_select, child_prefetch = get_related_lookups(field.child, lookup + "__", True)
+            prefetch_related += child_select + child_prefetch
+        elif isinstance(field, serializers.BaseSerializer):
+            if in_prefetch:
+                prefetch_related.append(lookup)
+            else:
+                select_related.append(lookup)
+            child_select, child_prefetch = get_related_lookups(field, lookup + "__", in_prefetch)
+            select_related += child_select
+            prefetch_related += child_prefetch
+    return select_related, prefetch_related
+
+class EagerLoadingMixin:
+    # Derives select_related/prefetch_related from the nested serializer fields,
+    # so views load exactly the relations the representation will touch.
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        select_related, prefetch_related = get_related_lookups(cls())
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+# Fields whose representation of a model value is the value itself.
+PASSTHROUGH_FIELDS = (serializers.IntegerField, serializers.BooleanField, serializers.CharField)
+
+def get_converter(field):
+    # Shortcuts for the common already-normalized values; anything else falls
+    # back to the field's own to_representation.
+    if isinstance(field, serializers.DecimalField) and field.decimal_places is not None and not field.localize \
+            and getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING) \
+            and not getattr(field, "normalize_output", False):
+        exponent = -field.decimal_places
+
+        def convert_decimal(value):
+            if type(value) is Decimal and value.as_tuple().exponent == exponent:
+                return "{:f}".format(value)
+            return field.to_representation(value)
+        return convert_decimal
+    if type(field) is serializers.DateField:
+        output_format = getattr(field, "format", api_settings.DATE_FORMAT)
+        if output_format is not None and output_format.lower() == ISO_8601:
+            return lambda value: value if isinstance(value, str) else value.isoformat()
+    return field.to_representation
+
+def compile_representation(serializer):
+    # Resolves each readable field to a plain attribute getter plus, where the
+    # value needs formatting, the field's own to_representation, so rows are
+    # rendered without per-field get_attribute/SkipField machinery.
+    model = serializer.Meta.model
+    accessors = []
+    for field in serializer._readable_fields:
+        if len(field.source_attrs) != 1:
+            accessors.append((field.field_name, field.get_attribute, field.to_representation))
+            continue
+        source = field.source_attrs[0]
+        if isinstance(field, serializers.ListSerializer) and hasattr(field.child, "get_fast_representation"):
+            represent_child = field.child.get_fast_representation()
+            accessors.append((field.field_name, attrgetter(source),
+                              lambda related, represent=represent_child: [represent(item) for item in related.all()]))
+        elif isinstance(field, serializers.BaseSerializer) and hasattr(field, "get_fast_representation"):
+            accessors.append((field.field_name, attrgetter(source), field.get_fast_representation()))
+        elif isinstance(field, serializers.PrimaryKeyRelatedField) and not field.pk_field:
+            accessors.append((field.field_name, attrgetter(model._meta.get_field(source).attname), None))
+        elif type(field) in PASSTHROUGH_FIELDS or isinstance(field, serializers.CharField):
+            accessors.append((field.field_name, attrgetter(source), None))
+        else:
+            accessors.append((field.field_name, attrgetter(source), get_converter(field)))
+
+    def represent(instance):
+        ret = {}
+        for name, get, convert in accessors:
+            value = get(instance)
+            if value is not None and convert is not None:
+                value = convert(value)
+            ret[name] = value
+        return ret
+    return represent
+
+class FastRepresentationMixin:
+    def get_fast_representation(self):
+        if not hasattr(self, "_fast_representation"):
+            self._fast_representation = compile_representation(self)
+        return self._fast_representation
+
+class TimedDataMixin:
+    # Only the top-level .data call is timed; nested fields go straight to
+    # to_representation() and are counted as part of their parent.
+    @property
+    def data(self):
+        with record_serializer_time():
+            return super().data
+
+class TimedListSerializer(TimedDataMixin, serializers.ListSerializer):
+    pass
+
+class FastListSerializer(TimedListSerializer):
+    # Read-only list path: compiles the child's fields once per response and
+    # reuses the accessors for every row.
+    def to_representation(self, data):
+        iterable = data.all() if hasattr(data, "all") else data
+        represent = self.child.get_fast_representation()
+        return [represent(item) for item in iterable]
+
+class UserSerializer(TimedDataMixin, FastRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id','username','email']
+        list_serializer_class = FastListSerializer
         
-class MenuItemSerializer(serializers.ModelSerializer):
+class MenuItemSerializer(TimedDataMixin, FastRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = MenuItem
         fields = ['id', 'title', 'price', 'featured', 'category']
+        list_serializer_class = FastListSerializer
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(TimedDataMixin, serializers.ModelSerializer):
     class Meta:
         model = Cart
         fields = '__all__'
+        list_serializer_class = TimedListSerializer
+
+class CartSummarySerializer(TimedDataMixin, serializers.ModelSerializer):
+    class Meta:
+        model = CartSummary
+        fields = ['item_count', 'subtotal']
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class CartEntrySerializer(serializers.Serializer):
+    menuitem = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, max_value=32767)
+
+class OrderItemSerializer(TimedDataMixin, FastRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = '__all__'
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(TimedDataMixin, EagerLoadingMixin, FastRepresentationMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     total = serializers.DecimalField(max_digits=6, decimal_places=2, read_only=True)
     date = serializers.DateField(read_only=True)
@@ -31,8 +162,46 @@ class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = ['user', 'delivery_crew', 'status', 'total', 'date', 'order_item']
+        list_serializer_class = FastListSerializer
         
-class CategorySerializer(serializers.ModelSerializer):
+class QueueOrderSerializer(OrderSerializer):
+    class Meta(OrderSerializer.Meta):
+        fields = ['id', 'user', 'status', 'total', 'date', 'updated_at', 'order_item']
+
+class CrewQueueQuerySerializer(serializers.Serializer):
+    since = serializers.IntegerField(min_value=0, required=False)
+    wait = serializers.IntegerField(min_value=0, max_value=MAX_WAIT_SECONDS, default=0)
+
+class CategorySerializer(TimedDataMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        list_serializer_class = TimedListSerializer
+
+class DailyRevenueSerializer(TimedDataMixin, serializers.ModelSerializer):
+    class Meta:
+        model = DailyRevenue
+        fields = ['date', 'order_count', 'revenue']
+        list_serializer_class = TimedListSerializer
+
+class RevenueSummarySerializer(TimedDataMixin, serializers.Serializer):
+    order_count = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    days = DailyRevenueSerializer(many=True)
+
+class MenuItemSalesSerializer(TimedDataMixin, serializers.Serializer):
+    menuitem = serializers.IntegerField()
+    title = serializers.CharField()
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        list_serializer_class = TimedListSerializer
+
+class CrewStatusCountSerializer(TimedDataMixin, serializers.ModelSerializer):
+    username = serializers.CharField(source='delivery_crew.username', default=None)
+
+    class Meta:
+        model = CrewStatusCount
+        fields = ['delivery_crew', 'username', 'status', 'order_count']
+        list_serializer_class = TimedListSerializer
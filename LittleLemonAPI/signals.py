@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+from .models import MenuItem, Category, Cart
+from .authentication import invalidate_token
+from .catalogue_cache import bump_catalogue_version
+from .instrumentation import install_query_recorder
+from .roles import group_names_cache_key
+from .totals import refresh_cart_summaries
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalogue(sender, **kwargs):
+    # Bumping before commit would let a concurrent reader cache the old rows
+    # under the new version.
+    transaction.on_commit(bump_catalogue_version)
+
+@receiver(pre_delete, sender=MenuItem)
+def collect_cart_users(sender, instance, **kwargs):
+    # The cascade removes these users' cart rows without touching their
+    # summaries, so remember whose to recompute once the rows are gone.
+    instance._cart_user_ids = list(Cart.objects.filter(menuitem=instance).values_list("user_id", flat=True))
+
+@receiver(post_delete, sender=MenuItem)
+def refresh_cart_users(sender, instance, **kwargs):
+    if getattr(instance, "_cart_user_ids", None):
+        refresh_cart_summaries(instance._cart_user_ids)
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    key = instance.key
+    transaction.on_commit(lambda: invalidate_token(key))
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    if not created:
+        keys = list(Token.objects.filter(user=instance).values_list("key", flat=True))
+        transaction.on_commit(lambda: [invalidate_token(key) for key in keys])
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_group_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    # Covers membership changes made outside the group endpoints (admin,
+    # shell), so a revoked role never outlives the change on any worker.
+    if action not in ("post_add", "post_remove", "post_clear", "pre_clear"):
+        return
+    if not reverse:
+        user_ids = [instance.pk]
+    elif pk_set is not None:
+        user_ids = pk_set
+    else:
+        user_ids = list(instance.user_set.values_list("pk", flat=True))
+    keys = [group_names_cache_key(user_id) for user_id in user_ids]
+    # After commit, so a concurrent request cannot re-cache the old groups.
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, "SQLITE_PRAGMAS", {}).items():
+            cursor.execute("PRAGMA {}={}".format(pragma, value))
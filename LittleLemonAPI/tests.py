@@ -1,3 +1,472 @@
+import base64
+import re
+from datetime import date, timedelta
+from django.utils import timezone
+from unittest import mock, skipUnless
 from django.test import TestCase
 
 # Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from .instrumentation import registry
+from .models import Category, MenuItem, Cart, CartSummary, Order, OrderItem, CrewQueueChange, DailyItemSales, Job
+from .search import fts_supported
+from .crew_queue import prune_queue_changes
+from .events import publish
+from .jobs import LEASE_SECONDS, claim_jobs, complete_jobs, fail_jobs, run_jobs, work_once
+from .roles import MANAGER_GROUP, DELIVERY_CREW_GROUP
+from .serializers import OrderSerializer
+
+class OrderEagerLoadingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user("manager")
+        cls.manager.groups.add(Group.objects.create(name=MANAGER_GROUP))
+        cls.customer = User.objects.create_user("customer")
+        category = Category.objects.create(slug="mains", title="Mains")
+        cls.menu_items = [MenuItem.objects.create(title="Item {}".format(i), price=5, featured=False, category=category) for i in range(3)]
+
+    def setUp(self):
+        for cache in caches.all(initialized_only=True):
+            cache.clear()
+
+    def create_orders(self, count):
+        orders = Order.objects.bulk_create([
+            Order(user=self.customer, total=15, date=date.today()) for _ in range(count)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, menuitem=menu_item, quantity=1, unit_price=5, price=5)
+            for order in orders
+            for menu_item in self.menu_items
+        ])
+
+    def test_serializer_query_count_does_not_grow_with_orders(self):
+        for count in (1, 100):
+            with self.subTest(orders=count):
+                Order.objects.all().delete()
+                self.create_orders(count)
+                # One query for the orders with their users, one for all their items.
+                with self.assertNumQueries(2):
+                    data = OrderSerializer(OrderSerializer.setup_eager_loading(Order.objects.all()), many=True).data
+                self.assertEqual(len(data), count)
+                self.assertEqual(len(data[0]["order_item"]), len(self.menu_items))
+
+    def test_orders_list_query_count_does_not_grow_with_orders(self):
+        client = APIClient()
+        client.force_authenticate(self.manager)
+        # Warms the role cache, which is not what this test measures.
+        client.get("/api/orders")
+        for count in (1, 100):
+            with self.subTest(orders=count):
+                Order.objects.all().delete()
+                self.create_orders(count)
+                with self.assertNumQueries(2):
+                    response = client.get("/api/orders?perpage=100")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data), count)
+
+    def test_streamed_export_queries_are_recorded(self):
+        self.create_orders(3)
+        registry.reset()
+        client = APIClient()
+        client.force_authenticate(self.manager)
+        response = client.get("/api/orders/export")
+        labels = (("view", "OrdersExport"), ("method", "GET"))
+        # Nothing is recorded until the body has been streamed.
+        self.assertNotIn(("request_queries", labels), registry.histograms)
+        lines = b"".join(response.streaming_content).splitlines()
+        response.close()
+        self.assertEqual(len(lines), 3)
+        self.assertGreater(registry.histograms[("request_queries", labels)].sum, 0)
+
+class CheckoutRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user("customer")
+        category = Category.objects.create(slug="mains", title="Mains")
+        cls.menu_items = [MenuItem.objects.create(title="Item {}".format(i), price=5, featured=False, category=category) for i in range(30)]
+
+    def setUp(self):
+        for cache in caches.all(initialized_only=True):
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def checkout(self, lines):
+        Cart.objects.bulk_create([
+            Cart(user=self.customer, menuitem=menu_item, quantity=2, unit_price=5, price=10)
+            for menu_item in self.menu_items[:lines]
+        ])
+        caches["throttle"].clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/api/orders")
+        self.assertEqual(response.status_code, 201)
+        return [query["sql"] for query in queries.captured_queries if DailyItemSales._meta.db_table in query["sql"]]
+
+    def test_item_rollups_take_one_statement_per_checkout(self):
+        for lines in (1, 30, 30):
+            with self.subTest(lines=lines):
+                self.assertEqual(len(self.checkout(lines)), 1)
+        sales = DailyItemSales.objects.order_by("menuitem_id")
+        self.assertEqual(sales.count(), 30)
+        self.assertEqual((sales[0].units, sales[0].revenue), (6, 30))
+        self.assertEqual((sales[29].units, sales[29].revenue), (4, 20))
+
+class CartBulkTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user("customer")
+        category = Category.objects.create(slug="mains", title="Mains")
+        cls.menu_items = [MenuItem.objects.create(title="Item {}".format(i), price=5, featured=False, category=category) for i in range(3)]
+
+    def setUp(self):
+        for cache in caches.all(initialized_only=True):
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def request(self, method, path, data=None):
+        caches["throttle"].clear()
+        return getattr(self.client, method)(path, data, format="json")
+
+    def cart(self):
+        return dict(Cart.objects.filter(user=self.customer).values_list("menuitem_id", "quantity"))
+
+    def summary(self):
+        summary = CartSummary.objects.get(user=self.customer)
+        return summary.item_count, summary.subtotal
+
+    def test_post_merges_entries_and_upserts_existing_lines(self):
+        first, second, _ = self.menu_items
+        self.request("post", "/api/cart/menu-items/bulk", [{"menuitem": first.id, "quantity": 1}])
+        response = self.request("post", "/api/cart/menu-items/bulk", [
+            {"menuitem": first.id, "quantity": 2},
+            {"menuitem": second.id, "quantity": 1},
+            {"menuitem": second.id, "quantity": 3},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.cart(), {first.id: 2, second.id: 4})
+        self.assertEqual(self.summary(), (6, 30))
+
+    def test_put_replaces_the_cart(self):
+        first, second, third = self.menu_items
+        self.request("post", "/api/cart/menu-items/bulk", [
+            {"menuitem": first.id, "quantity": 1},
+            {"menuitem": second.id, "quantity": 1},
+        ])
+        response = self.request("put", "/api/cart/menu-items/bulk", [{"menuitem": third.id, "quantity": 2}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.cart(), {third.id: 2})
+        self.assertEqual(self.summary(), (2, 10))
+
+    def test_line_price_over_the_field_limit_is_rejected(self):
+        first, second, _ = self.menu_items
+        self.request("post", "/api/cart/menu-items/bulk", [{"menuitem": second.id, "quantity": 1}])
+        response = self.request("post", "/api/cart/menu-items/bulk", [
+            {"menuitem": first.id, "quantity": 30000},
+            {"menuitem": second.id, "quantity": 2},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("price", response.data[str(first.id)])
+        self.assertEqual(self.cart(), {second.id: 1})
+        self.assertEqual(self.summary(), (1, 5))
+        self.assertEqual(self.request("get", "/api/cart/menu-items").status_code, 200)
+
+    def test_unknown_menu_item_is_rejected(self):
+        response = self.request("post", "/api/cart/menu-items/bulk", [{"menuitem": 0, "quantity": 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.cart(), {})
+
+class CrewQueueTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user("manager")
+        cls.manager.groups.add(Group.objects.create(name=MANAGER_GROUP))
+        cls.crew = User.objects.create_user("crew")
+        cls.crew.groups.add(Group.objects.create(name=DELIVERY_CREW_GROUP))
+        customer = User.objects.create_user("customer")
+        cls.orders = Order.objects.bulk_create([Order(user=customer, total=10, date=date.today()) for _ in range(3)])
+
+    def setUp(self):
+        for cache in caches.all(initialized_only=True):
+            cache.clear()
+
+    def request(self, user, method, path, data=None):
+        caches["throttle"].clear()
+        client = APIClient()
+        client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(client, method)(path, data, format="json")
+
+    def assign(self, order, status=False):
+        response = self.request(self.manager, "patch", "/api/orders/{}".format(order.id), {"delivery_crew": self.crew.id, "status": status})
+        self.assertEqual(response.status_code, 200)
+
+    def poll(self, since=None):
+        response = self.request(self.crew, "get", "/api/orders/queue", None if since is None else {"since": since})
+        self.assertEqual(response.status_code, 200)
+        return response.data["token"], [order["id"] for order in response.data["orders"]], response.data["removed"]
+
+    def test_polling_since_a_token_returns_only_later_changes(self):
+        first, second, third = self.orders
+        self.assign(first)
+        token, orders, removed = self.poll()
+        self.assertEqual((orders, removed), ([first.id], []))
+        self.assertEqual(self.poll(token), (token, [], []))
+        self.assign(second)
+        self.assign(third)
+        later, orders, removed = self.poll(token)
+        self.assertGreater(later, token)
+        self.assertEqual((orders, removed), ([second.id, third.id], []))
+
+    def test_delivered_and_deleted_orders_are_reported_as_removed(self):
+        first, second, _ = self.orders
+        self.assign(first)
+        self.assign(second)
+        token, _, _ = self.poll()
+        self.assign(first, status=True)
+        self.request(self.manager, "delete", "/api/orders/{}".format(second.id))
+        _, orders, removed = self.poll(token)
+        self.assertEqual((orders, removed), ([], [first.id, second.id]))
+
+    def test_pruned_token_has_expired(self):
+        first, second, _ = self.orders
+        self.assign(first)
+        token, _, _ = self.poll()
+        self.assign(second)
+        self.assign(second, status=True)
+        prune_queue_changes(timezone.now() + timedelta(seconds=1))
+        response = self.request(self.crew, "get", "/api/orders/queue", {"since": token})
+        self.assertEqual(response.status_code, 410)
+        current, _, _ = self.poll()
+        self.assertEqual(self.poll(current), (current, [], []))
+
+class JobQueueTests(TestCase):
+
+    def handle(self, handler):
+        return mock.patch("LittleLemonAPI.jobs.get_handlers", return_value=[handler])
+
+    def test_claimed_jobs_are_handed_out_once_and_deleted_when_done(self):
+        for order_id in range(3):
+            publish("test.event", order_id=order_id)
+        claimed = claim_jobs("a")
+        self.assertEqual([job.attempts for job in claimed], [1, 1, 1])
+        self.assertEqual(claim_jobs("b"), [])
+        handled = []
+        with self.handle(handled.extend):
+            run_jobs(claimed)
+        self.assertEqual(handled, [{"order_id": 0}, {"order_id": 1}, {"order_id": 2}])
+        self.assertFalse(Job.objects.exists())
+
+    def test_failing_jobs_back_off_then_give_up(self):
+        publish("test.event")
+
+        def fail(payloads):
+            raise RuntimeError("handler failed")
+
+        with self.handle(fail), self.assertLogs("LittleLemonAPI.jobs", "ERROR"):
+            before = timezone.now()
+            work_once("a", max_attempts=2)
+            job = Job.objects.get()
+            self.assertEqual((job.status, job.attempts, job.locked_by), (Job.PENDING, 1, ""))
+            self.assertGreaterEqual(job.run_after, before + timedelta(seconds=2))
+            self.assertEqual(work_once("a", max_attempts=2), 0)
+            Job.objects.update(run_after=timezone.now())
+            work_once("a", max_attempts=2)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn("handler failed", job.last_error)
+
+    def test_expired_lease_is_reclaimed_and_the_old_worker_loses_it(self):
+        publish("test.event")
+        stale = claim_jobs("a")
+        later = timezone.now() + timedelta(seconds=LEASE_SECONDS + 1)
+        with mock.patch("LittleLemonAPI.jobs.timezone.now", return_value=later):
+            reclaimed = claim_jobs("b")
+        self.assertEqual([job.attempts for job in reclaimed], [2])
+        complete_jobs(stale)
+        fail_jobs(stale, "lost lease")
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.locked_by, job.last_error), (Job.RUNNING, "b", ""))
+        complete_jobs(reclaimed)
+        self.assertFalse(Job.objects.exists())
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user("customer")
+        category = Category.objects.create(slug="mains", title="Mains")
+        # Equal prices straddle every page boundary at two items per page.
+        cls.menu_items = [
+            MenuItem.objects.create(title="Item {}".format(i), price=price, featured=False, category=category)
+            for i, price in enumerate([7, 5, 5, 7, 5, 5, 9])
+        ]
+
+    def setUp(self):
+        for cache in caches.all(initialized_only=True):
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def get(self, path, params=None):
+        caches["throttle"].clear()
+        return self.client.get(path, params)
+
+    def walk(self, ordering):
+        ids = []
+        response = self.get("/api/menu-items", {"pagination": "cursor", "perpage": 2, "ordering": ordering})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids += [item["id"] for item in response.data]
+            match = re.match(r'<(.*)>; rel="next"', response.get("Link", ""))
+            if not match:
+                return ids
+            response = self.get(match.group(1))
+
+    def test_ascending_pages_break_ties_by_id(self):
+        expected = [item.id for item in sorted(self.menu_items, key=lambda item: (item.price, item.id))]
+        self.assertEqual(self.walk("price"), expected)
+
+    def test_descending_pages_break_ties_by_id(self):
+        expected = [item.id for item in sorted(self.menu_items, key=lambda item: (item.price, item.id), reverse=True)]
+        self.assertEqual(self.walk("-price"), expected)
+
+    def test_invalid_cursor_is_rejected(self):
+        wrong_shape = base64.urlsafe_b64encode(b"[1, 2, 3]").decode()
+        for cursor in ("not a cursor", wrong_shape):
+            with self.subTest(cursor):
+                response = self.get("/api/menu-items", {"cursor": cursor, "ordering": "price"})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("cursor", response.data)
+
+    def test_perpage_is_capped(self):
+        category = Category.objects.get()
+        MenuItem.objects.bulk_create([
+            MenuItem(title="Extra {}".format(i), price=1, featured=False, category=category) for i in range(100)
+        ])
+        response = self.get("/api/menu-items", {"pagination": "cursor", "perpage": 1000})
+        self.assertEqual(len(response.data), 100)
+        self.assertIn("Link", response)
+        self.assertEqual(self.get("/api/menu-items", {"perpage": 0}).status_code, 400)
+
+# Any SCAN in SQLite's plan walks a whole table or index; hot queries must
+# SEARCH. The exceptions are scans of a partial index, which only holds the
+# rows its condition selects, and of the group table, which has one row per
+# role.
+SCAN = re.compile(r"\bSCAN (\S+)(?: USING (?:COVERING )?INDEX (\S+))?")
+SMALL_TABLES = {"auth_group"}
+
+def partial_indexes():
+    return {index.name for model in (Order, CrewQueueChange) for index in model._meta.indexes if index.condition}
+
+def full_scans(plan):
+    return [
+        table for table, index in SCAN.findall(plan)
+        if table not in SMALL_TABLES and index not in partial_indexes()
+    ]
+
+@skipUnless(connection.vendor == "sqlite", "Plans are checked against SQLite's EXPLAIN QUERY PLAN output.")
+class QueryPlanTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        customers = User.objects.bulk_create([User(username="customer{}".format(i)) for i in range(200)])
+        crew = User.objects.bulk_create([User(username="crew{}".format(i)) for i in range(20)])
+        Group.objects.create(name=MANAGER_GROUP).user_set.add(*customers[:5])
+        Group.objects.create(name=DELIVERY_CREW_GROUP).user_set.add(*crew)
+        categories = Category.objects.bulk_create([
+            Category(slug="category-{}".format(i), title="Category {}".format(i)) for i in range(20)
+        ])
+        menu_items = MenuItem.objects.bulk_create([
+            MenuItem(title="Item {}".format(i), price=1 + i % 30, featured=False, category=categories[i % 20])
+            for i in range(500)
+        ])
+        # Most orders are delivered, as in a live history; a few are open.
+        orders = Order.objects.bulk_create([
+            Order(user=customers[i % 200], delivery_crew=crew[i % 20], status=i % 7 != 0, total=10,
+                  date=date.today() - timedelta(days=i % 365))
+            for i in range(5000)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, menuitem=menu_items[i % 500], quantity=1, unit_price=10, price=10)
+            for i, order in enumerate(orders)
+        ])
+        Cart.objects.bulk_create([
+            Cart(user=customers[i % 200], menuitem=menu_items[i], quantity=1, unit_price=1, price=1)
+            for i in range(500)
+        ])
+        CrewQueueChange.objects.bulk_create([
+            CrewQueueChange(delivery_crew=crew[i % 20], order=order, open=True) for i, order in enumerate(orders[:2000])
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        cls.customer, cls.crew = customers[0], crew[0]
+
+    def hot_queries(self):
+        # (queryset, index the plan has to use, or None for any index)
+        return {
+            "orders by customer": (Order.objects.filter(user=self.customer).order_by("-date", "-id"), "order_user_date_idx"),
+            "orders by crew": (Order.objects.filter(delivery_crew=self.crew).order_by("-date", "-id"), "order_crew_date_idx"),
+            "delivered orders by crew": (
+                Order.objects.filter(delivery_crew=self.crew, status=True).order_by("date", "id"), "order_crew_date_idx"),
+            "open orders by crew": (Order.objects.filter(delivery_crew=self.crew, status=False).order_by("id"), "order_open_crew_idx"),
+            "open orders": (Order.objects.filter(status=False).order_by("date", "id"), "order_open_date_idx"),
+            "order items for a page": (OrderItem.objects.filter(order_id__in=[1, 2, 3]), None),
+            "menu items by category and price": (
+                MenuItem.objects.filter(category__title="Category 1", price__lte=10), "menuitem_category_price_idx"),
+            "cart by user": (Cart.objects.filter(user=self.customer), None),
+            "group members": (User.objects.filter(groups__name=MANAGER_GROUP).order_by("id"), None),
+            "crew queue changes": (
+                CrewQueueChange.objects.filter(delivery_crew=self.crew, id__gt=1000).order_by("id"), None),
+        }
+
+    def test_hot_queries_use_the_expected_indexes(self):
+        for name, (queryset, index) in self.hot_queries().items():
+            with self.subTest(name):
+                plan = queryset.explain()
+                self.assertEqual(full_scans(plan), [], plan)
+                if index:
+                    self.assertRegex(plan, r"INDEX {}\b".format(index))
+
+@skipUnless(fts_supported(connection), "Fuzzy search needs SQLite's FTS5 trigram tokenizer.")
+class SearchTypoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user("customer")
+        category = Category.objects.create(slug="mains", title="Mains")
+        for title in ("Pizza", "Pasta", "Greek Salad", "Lemon Chicken", "Bruschetta"):
+            MenuItem.objects.create(title=title, price=5, featured=False, category=category)
+
+    def setUp(self):
+        for cache in caches.all(initialized_only=True):
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def search(self, text):
+        # The menu item throttle allows only a handful of requests a minute.
+        caches["throttle"].clear()
+        response = self.client.get("/api/menu-items", {"search": text})
+        self.assertEqual(response.status_code, 200)
+        return [item["title"] for item in response.data]
+
+    def test_single_typo_finds_the_item(self):
+        for text, title in [
+            ("piza", "Pizza"), ("pizaa", "Pizza"), ("psta", "Pasta"), ("pasat", "Pasta"),
+            ("salda", "Greek Salad"), ("lemn", "Lemon Chicken"), ("chiken", "Lemon Chicken"),
+            ("bruscheta", "Bruschetta"),
+        ]:
+            with self.subTest(text):
+                self.assertEqual(self.search(text)[:1], [title])
+
+    def test_unrelated_text_finds_nothing(self):
+        self.assertEqual(self.search("zzzz"), [])
@@ -0,0 +1,66 @@
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import PyLibMCCache, PyMemcacheCache
+from django.core.cache.backends.redis import RedisCache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+THROTTLE_CACHE_ALIAS = "throttle"
+# Backends whose incr() is a single atomic operation. LocMemCache only counts
+# within one process, which settings allow under DEBUG alone; the file and
+# database backends read and write back, losing concurrent increments.
+ATOMIC_INCR_BACKENDS = (RedisCache, PyMemcacheCache, PyLibMCCache, LocMemCache)
+
+class FixedWindowScopedRateThrottle(SimpleRateThrottle):
+    # Counts requests per (scope, user, window) with atomic cache increments
+    # instead of rewriting a timestamp history list on every request.
+    scope_attr = "throttle_scope"
+    cache_format = "throttle_%(scope)s_%(ident)s_%(window)s"
+
+    def __init__(self):
+        # The scope comes from the view, so the rate is resolved in allow_request.
+        self.cache = caches[THROTTLE_CACHE_ALIAS]
+        if not isinstance(self.cache, ATOMIC_INCR_BACKENDS):
+            raise ImproperlyConfigured(
+                "The '{}' cache must support atomic increments, e.g. Redis.".format(THROTTLE_CACHE_ALIAS))
+
+    @property
+    def THROTTLE_RATES(self):
+        # Looked up per request instead of frozen at import, so overriding
+        # REST_FRAMEWORK (e.g. in the benchmark runner) changes the limits.
+        return api_settings.DEFAULT_THROTTLE_RATES
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": ident,
+            "window": self.window,
+        }
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.now = self.timer()
+        self.window = int(self.now // self.duration)
+        self.key = self.get_cache_key(request, view)
+        if self.cache.add(self.key, 1, self.duration):
+            count = 1
+        else:
+            try:
+                count = self.cache.incr(self.key)
+            except ValueError:
+                # The window expired between add() and incr().
+                self.cache.add(self.key, 1, self.duration)
+                count = 1
+        return count <= self.num_requests
+
+    def wait(self):
+        return (self.window + 1) * self.duration - self.now
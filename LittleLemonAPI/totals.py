@@ -0,0 +1,38 @@
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import Cart, CartSummary
+
+def refresh_cart_summary(user):
+    totals = Cart.objects.filter(user=user).aggregate(item_count=Sum("quantity"), subtotal=Sum("price"))
+    CartSummary.objects.update_or_create(
+        user=user,
+        defaults={
+            "item_count": totals["item_count"] or 0,
+            "subtotal": totals["subtotal"] or 0,
+        }
+    )
+
+def add_to_cart_summary(user, quantity, price):
+    updated = CartSummary.objects.filter(user=user).update(
+        item_count=F("item_count") + quantity,
+        subtotal=F("subtotal") + price
+    )
+    if not updated:
+        # First write for this user: seed the summary from the cart itself.
+        refresh_cart_summary(user)
+
+def clear_cart_summary(user):
+    CartSummary.objects.filter(user=user).update(item_count=0, subtotal=0)
+
+def cart_total(field):
+    return Coalesce(Subquery(
+        Cart.objects.filter(user=OuterRef("user")).order_by().values("user").annotate(total=Sum(field)).values("total")
+    ), Value(0))
+
+def refresh_cart_summaries(user_ids):
+    # One statement however many carts are affected, e.g. when deleting a
+    # menu item cascades to every cart that held it.
+    CartSummary.objects.filter(user_id__in=user_ids).update(
+        item_count=cart_total("quantity"),
+        subtotal=cart_total("price")
+    )
@@ -9,7 +9,16 @@ urlpatterns = [
     path('menu-items', views.MenuItemsList.as_view()),
     path('menu-items/<int:id>', views.MenuItemsDetail.as_view()),
     path('cart/menu-items', views.CartList.as_view()),
+    path('cart/menu-items/bulk', views.CartBulk.as_view()),
+    path('cart/summary', views.CartSummaryDetail.as_view()),
     path('orders', views.OrdersList.as_view()),
+    path('orders/export', views.OrdersExport.as_view()),
+    path('orders/queue', views.CrewQueue.as_view()),
     path('orders/<int:id>', views.OrdersDetail.as_view()),
-    path('categories', views.CategoriesList.as_view())
+    path('categories', views.CategoriesList.as_view()),
+    path('metrics', views.Metrics.as_view()),
+    path('metrics/slow', views.SlowEndpoints.as_view()),
+    path('analytics/revenue', views.RevenueAnalytics.as_view()),
+    path('analytics/menu-items', views.MenuItemAnalytics.as_view()),
+    path('analytics/crew', views.CrewAnalytics.as_view())
 ]
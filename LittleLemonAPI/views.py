@@ -1,53 +1,77 @@
 from rest_framework.views import APIView
+from .async_views import AsyncAPIView
 from rest_framework.response import Response
 from rest_framework.decorators import permission_classes
 from rest_framework import status
-from rest_framework.throttling import UserRateThrottle
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth.models import User, Group
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import F, Sum
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, get_list_or_404
-from django.core.paginator import Paginator, EmptyPage
-from .serializers import UserSerializer, MenuItemSerializer, CartSerializer, OrderSerializer, CategorySerializer
-from .models import MenuItem, Cart, Order, OrderItem, Category
+from .serializers import UserSerializer, MenuItemSerializer, CartSerializer, CartEntrySerializer, CartSummarySerializer, OrderSerializer, CategorySerializer, QueueOrderSerializer, CrewQueueQuerySerializer, RevenueSummarySerializer, MenuItemSalesSerializer, CrewStatusCountSerializer
+from .models import MenuItem, Cart, CartSummary, Order, OrderItem, Category, DailyRevenue, DailyItemSales, CrewStatusCount
+from .events import publish_order_created, publish_order_changes
+from .rollups import record_order_created, record_order_changed, record_order_deleted
+from .crew_queue import record_order_queue_changes, record_order_queue_removed, open_orders, aget_queue_position, aget_queue_changes, ais_token_expired, await_queue_change
+from .routers import use_primary
+from .totals import add_to_cart_summary, clear_cart_summary, refresh_cart_summary
+from .filters import MenuItemFilter, OrderFilter, OrderExportFilter, AnalyticsFilter
+from .export import stream_csv, stream_ndjson
+from .catalogue_cache import cache_catalogue_response, acatalogue_validators
+from .conditional import conditional_response, make_etag
+from .pagination import KeysetPaginator, get_perpage, apaginate_queryset
+from .throttling import FixedWindowScopedRateThrottle
+from .instrumentation import PROMETHEUS_CONTENT_TYPE, registry as metrics_registry
+from .roles import MANAGER_GROUP, DELIVERY_CREW_GROUP, CUSTOMER_GROUP, get_group, aget_group, get_group_names, aget_group_names, invalidate_group_names
+from asyncio import iscoroutinefunction
 from datetime import date
 
-MANAGER_GROUP = "Manager"
-DELIVERY_CREW_GROUP = "Delivery Crew"
-CUSTOMER_GROUP = "Customer"
+def is_allowed(group, group_names):
+    if MANAGER_GROUP in group and MANAGER_GROUP in group_names:
+        return True
+    if DELIVERY_CREW_GROUP in group and DELIVERY_CREW_GROUP in group_names:
+        return True
+    return CUSTOMER_GROUP in group
 
 def only_for(group):
     def decorator_only_for(func):
+        if iscoroutinefunction(func):
+            async def async_wrapper(*args,**kwargs):
+                request = args[1]
+                if is_allowed(group, await aget_group_names(request.user)):
+                    return await func(*args,**kwargs)
+                return Response(status=status.HTTP_403_FORBIDDEN)
+            return async_wrapper
+
         def wrapper(*args,**kwargs):
             request = args[1]
-            if MANAGER_GROUP in group and request.user.groups.filter(name=MANAGER_GROUP).exists():
-                return func(*args,**kwargs)
-            if DELIVERY_CREW_GROUP in group and request.user.groups.filter(name=DELIVERY_CREW_GROUP).exists():
-                return func(*args,**kwargs)
-            if CUSTOMER_GROUP in group:
+            if is_allowed(group, get_group_names(request.user)):
                 return func(*args,**kwargs)
             return Response(status=status.HTTP_403_FORBIDDEN)
         return wrapper
     return decorator_only_for
 
-def get_group(user):
-    if user.groups.filter(name=MANAGER_GROUP).exists():
-        return MANAGER_GROUP    
-    elif user.groups.filter(name=DELIVERY_CREW_GROUP).exists():       
-        return DELIVERY_CREW_GROUP
-    else:
-        return CUSTOMER_GROUP
+def list_group_members(request, group_name):
+    users = User.objects.filter(groups__name=group_name).only("id", "username", "email").order_by("id")
+    paginator = None
+    if "perpage" in request.query_params or KeysetPaginator.cursor_query_param in request.query_params:
+        paginator = KeysetPaginator(perpage=get_perpage(request))
+        users = paginator.paginate_queryset(users, request)
+    serialized_item = UserSerializer(users, many=True)
+    response = Response(serialized_item.data, status=status.HTTP_200_OK)
+    if paginator:
+        paginator.add_link_header(response, request)
+    return response
     
 @permission_classes([IsAuthenticated])
 class ManagerList(APIView):
 
     @only_for([MANAGER_GROUP])
     def get(self, request, format=None):
-        managers = []
-        for user in get_list_or_404(User):
-            if user.groups.filter(name=MANAGER_GROUP).exists():            
-                serialized_item = UserSerializer(user)
-                managers.append(serialized_item.data)
-        return Response(managers, status=status.HTTP_200_OK)
+        return list_group_members(request, MANAGER_GROUP)
 
     @only_for([MANAGER_GROUP])
     def post(self, request, format=None):
@@ -56,6 +80,7 @@ class ManagerList(APIView):
             user = get_object_or_404(User, username=username)
             managers = Group.objects.get(name=MANAGER_GROUP)
             managers.user_set.add(user)
+            invalidate_group_names(user)
             return Response(status=status.HTTP_201_CREATED)
         except:
             return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -68,6 +93,7 @@ class ManagerDetail(APIView):
         user = get_object_or_404(User, id=userId)
         managers = Group.objects.get(name=MANAGER_GROUP)
         managers.user_set.remove(user)
+        invalidate_group_names(user)
         return Response(status=status.HTTP_200_OK)
     
 @permission_classes([IsAuthenticated])
@@ -75,12 +101,7 @@ class DeliveryCrewList(APIView):
 
     @only_for([MANAGER_GROUP])
     def get(self, request, format=None):
-        delivery_crews = []
-        for user in get_list_or_404(User):
-            if user.groups.filter(name=DELIVERY_CREW_GROUP).exists():            
-                serialized_item = UserSerializer(user)
-                delivery_crews.append(serialized_item.data)
-        return Response(delivery_crews, status=status.HTTP_200_OK)
+        return list_group_members(request, DELIVERY_CREW_GROUP)
     
     @only_for([MANAGER_GROUP])
     def post(self, request, format=None):
@@ -89,6 +110,7 @@ class DeliveryCrewList(APIView):
             user = get_object_or_404(User, username=username)
             delivery_crews = Group.objects.get(name=DELIVERY_CREW_GROUP)
             delivery_crews.user_set.add(user)
+            invalidate_group_names(user)
             return Response(status=status.HTTP_201_CREATED)
         except:
             return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -101,41 +123,27 @@ class DeliveryCrewDetail(APIView):
         user = get_object_or_404(User, id=userId)
         delivery_crews = Group.objects.get(name=DELIVERY_CREW_GROUP)
         delivery_crews.user_set.remove(user)
+        invalidate_group_names(user)
         return Response(status=status.HTTP_200_OK)
 
 @permission_classes([IsAuthenticated])
-class MenuItemsList(APIView):
+class MenuItemsList(AsyncAPIView):
     
-    def get_throttles(self):
-        if self.get:
-            return [UserRateThrottle()]
-        return []
+    throttle_classes = [FixedWindowScopedRateThrottle]
+    throttle_scope = "menu-items"
     
     @only_for([MANAGER_GROUP, DELIVERY_CREW_GROUP, CUSTOMER_GROUP])
-    def get(self, request, format=None):
-        menu_items = MenuItem.objects.select_related("category").all()
-        category_name = request.query_params.get("category")
-        to_price = request.query_params.get("to_price")
-        search = request.query_params.get("search")
-        ordering = request.query_params.get("ordering")
-        perpage = request.query_params.get("perpage", default=2)
-        page = request.query_params.get("page", default=1)
-        if category_name:
-            menu_items = menu_items.filter(category__title=category_name)
-        if to_price:
-            menu_items = menu_items.filter(price__lte=to_price)
-        if search:
-            menu_items = menu_items.filter(title__startswith=search)
-        if ordering:
-            ordering_fields = ordering.split(",")
-            menu_items = menu_items.order_by(*ordering_fields)
-        paginator = Paginator(menu_items, per_page=perpage)
-        try:
-            menu_items = paginator.page(number=page)
-        except EmptyPage:
-            menu_items = []
+    @conditional_response(acatalogue_validators("menu-items"))
+    @cache_catalogue_response("menu-items")
+    async def get(self, request, format=None):
+        query = MenuItemFilter(request.query_params)
+        menu_items = query.filter_queryset(MenuItem.objects.all())
+        menu_items, paginator = await apaginate_queryset(menu_items, request, query.ordering)
         serialized_item = MenuItemSerializer(menu_items, many=True)
-        return Response(serialized_item.data, status=status.HTTP_200_OK)
+        response = Response(serialized_item.data, status=status.HTTP_200_OK)
+        if paginator:
+            paginator.add_link_header(response, request)
+        return response
 
     @only_for([MANAGER_GROUP])
     def post(self, request, format=None):
@@ -145,16 +153,19 @@ class MenuItemsList(APIView):
         return Response(serialized_item.data, status=status.HTTP_201_CREATED)
 
 @permission_classes([IsAuthenticated])
-class MenuItemsDetail(APIView):
+class MenuItemsDetail(AsyncAPIView):
     
-    def get_throttles(self):
-        if self.get:
-            return [UserRateThrottle()]
-        return []
+    throttle_classes = [FixedWindowScopedRateThrottle]
+    throttle_scope = "menu-items"
 
     @only_for([MANAGER_GROUP, DELIVERY_CREW_GROUP, CUSTOMER_GROUP])
-    def get(self, request, id, format=None):
-        menu_item = get_object_or_404(MenuItem, id=id)
+    @conditional_response(acatalogue_validators("menu-items/{id}"))
+    @cache_catalogue_response("menu-items/{id}")
+    async def get(self, request, id, format=None):
+        try:
+            menu_item = await MenuItem.objects.aget(id=id)
+        except MenuItem.DoesNotExist:
+            raise Http404
         serialized_item = MenuItemSerializer(menu_item)
         return Response(serialized_item.data, status=status.HTTP_200_OK)
     
@@ -202,109 +213,234 @@ class CartList(APIView):
             }
             serialized_item = CartSerializer(data=data)
             serialized_item.is_valid(raise_exception=True)
-            serialized_item.save()
+            with transaction.atomic():
+                serialized_item.save()
+                add_to_cart_summary(request.user, data["quantity"], data["price"])
             return Response(serialized_item.data, status=status.HTTP_201_CREATED)
         except:
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
     @only_for([CUSTOMER_GROUP])
     def delete(self, request, format=None):
-        for cart in get_list_or_404(Cart, user=request.user):
-            cart.delete()
+        with transaction.atomic():
+            deleted, _ = Cart.objects.filter(user=request.user).delete()
+            if not deleted:
+                raise Http404
+            clear_cart_summary(request.user)
         return Response(status=status.HTTP_200_OK)
 
 @permission_classes([IsAuthenticated])
-class OrdersList(APIView):
+class CartSummaryDetail(APIView):
+
+    @only_for([CUSTOMER_GROUP])
+    def get(self, request, format=None):
+        summary = CartSummary.objects.filter(user=request.user).first() or CartSummary(user=request.user)
+        serialized_item = CartSummarySerializer(summary)
+        return Response(serialized_item.data, status=status.HTTP_200_OK)
+
+def build_cart_rows(user, entries):
+    quantities = {}
+    for entry in entries:
+        quantities[entry["menuitem"]] = quantities.get(entry["menuitem"], 0) + entry["quantity"]
+    menu_items = MenuItem.objects.in_bulk(list(quantities))
+    missing = [menuitem for menuitem in quantities if menuitem not in menu_items]
+    if missing:
+        raise ValidationError({"menuitem": ["Unknown menu items: {}.".format(", ".join(map(str, missing)))]})
+    rows = []
+    errors = {}
+    for menuitem, quantity in quantities.items():
+        row = Cart(
+            user=user,
+            menuitem_id=menuitem,
+            quantity=quantity,
+            unit_price=menu_items[menuitem].price,
+            price=quantity * menu_items[menuitem].price
+        )
+        # bulk_create() skips CartSerializer, so the merged quantities and
+        # line prices are checked against the model's limits here.
+        try:
+            row.clean_fields(exclude=["user", "menuitem"])
+        except DjangoValidationError as error:
+            errors[str(menuitem)] = error.message_dict
+        rows.append(row)
+    if errors:
+        raise ValidationError(errors)
+    return rows
+
+@permission_classes([IsAuthenticated])
+class CartBulk(APIView):
+
+    def save_entries(self, request, replace):
+        serialized_entries = CartEntrySerializer(data=request.data, many=True)
+        serialized_entries.is_valid(raise_exception=True)
+        with transaction.atomic():
+            rows = build_cart_rows(request.user, serialized_entries.validated_data)
+            if replace:
+                Cart.objects.filter(user=request.user).delete()
+            Cart.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["menuitem", "user"],
+                update_fields=["quantity", "unit_price", "price"]
+            )
+            refresh_cart_summary(request.user)
+        serialized_item = CartSerializer(Cart.objects.filter(user=request.user), many=True)
+        return Response(serialized_item.data, status=status.HTTP_200_OK)
+
+    @only_for([CUSTOMER_GROUP])
+    def post(self, request, format=None):
+        return self.save_entries(request, replace=False)
+
+    @only_for([CUSTOMER_GROUP])
+    def put(self, request, format=None):
+        return self.save_entries(request, replace=True)
+
+@permission_classes([IsAuthenticated])
+class OrdersList(AsyncAPIView):
     
-    def get_throttles(self):
-        if self.get:
-            return [UserRateThrottle()]
-        return []
+    throttle_classes = [FixedWindowScopedRateThrottle]
+    throttle_scope = "orders"
     
     @only_for([MANAGER_GROUP, DELIVERY_CREW_GROUP,  CUSTOMER_GROUP])
-    def get(self, request, format=None):
-        user_group = get_group(request.user)
-        if user_group == MANAGER_GROUP:
-            orders = Order.objects.select_related("user", "delivery_crew").all()
-        elif user_group == DELIVERY_CREW_GROUP:
-            orders = Order.objects.select_related("user", "delivery_crew").filter(delivery_crew=request.user)
-        else:
-            orders = Order.objects.select_related("user", "delivery_crew").filter(user=request.user)
-        
-        user_name = request.query_params.get("user")
-        delivery_crew_name = request.query_params.get("delivery_crew")
-        to_total = request.query_params.get("to_total")
-        order_status = request.query_params.get("status")
-        ordering = request.query_params.get("ordering")
-        perpage = request.query_params.get("perpage", default=2)
-        page = request.query_params.get("page", default=1)
-        if user_name:
-            orders = orders.filter(user__username=user_name)
-        if delivery_crew_name:
-            orders = orders.filter(delivery_crew__username=delivery_crew_name)
-        if to_total:
-            orders = orders.filter(total__lte=to_total)
-        if order_status:
-            orders = orders.filter(status__exact=order_status)
-        if ordering:
-            ordering_fields = ordering.split(",")
-            orders = orders.order_by(*ordering_fields)
-        paginator = Paginator(orders, per_page=perpage)
-        try:
-            orders = paginator.page(number=page)
-        except EmptyPage:
-            orders = []
-        
+    async def get(self, request, format=None):
+        user_group = await aget_group(request.user)
+        query = OrderFilter(request.query_params)
+        orders = query.filter_queryset(OrderSerializer.setup_eager_loading(Order.objects.all()))
+        if user_group == DELIVERY_CREW_GROUP:
+            orders = orders.filter(delivery_crew=request.user)
+        elif user_group != MANAGER_GROUP:
+            orders = orders.filter(user=request.user)
+        orders, paginator = await apaginate_queryset(orders, request, query.ordering)
         serialized_item = OrderSerializer(orders, many=True)
-        return Response(serialized_item.data, status=status.HTTP_200_OK)
+        response = Response(serialized_item.data, status=status.HTTP_200_OK)
+        if paginator:
+            paginator.add_link_header(response, request)
+        return response
 
     @only_for([CUSTOMER_GROUP])
     def post(self, request, format=None):
-        order = Order(user=request.user, total=0, date=date.today())
-        order.save()
-        total = 0
-        for item in get_list_or_404(Cart, user=request.user):
-            order_item = OrderItem(
-                order=order,
-                menuitem=item.menuitem,
-                quantity=item.quantity,
-                unit_price=item.unit_price,
-                price=item.price
-            )
-            total += item.price
-            order_item.save()
-            item.delete()
-        order = get_object_or_404(Order, id=order.id)
-        order.total = total
-        order.save(update_fields=['total'])
+        with transaction.atomic():
+            # Locking the user row serializes concurrent checkouts, so a retried
+            # POST sees the cart already emptied instead of ordering it twice.
+            User.objects.select_for_update().only("id").get(id=request.user.id)
+            cart = Cart.objects.filter(user=request.user)
+            total = cart.aggregate(total=Sum("price"))["total"]
+            if total is None:
+                raise Http404
+            order = Order.objects.create(user=request.user, total=total, date=date.today())
+            order_items = OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    menuitem_id=item.menuitem_id,
+                    quantity=item.quantity,
+                    unit_price=item.unit_price,
+                    price=item.price
+                )
+                for item in cart
+            ])
+            cart.delete()
+            clear_cart_summary(request.user)
+            record_order_created(order, order_items)
+            publish_order_created(order)
         serialized_item = OrderSerializer(order)
         return Response(serialized_item.data, status=status.HTTP_201_CREATED)
 
+@permission_classes([IsAuthenticated])
+class CrewQueue(AsyncAPIView):
+
+    throttle_classes = [FixedWindowScopedRateThrottle]
+    throttle_scope = "orders"
+
+    @only_for([DELIVERY_CREW_GROUP])
+    async def get(self, request, format=None):
+        query = CrewQueueQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        since = query.validated_data.get("since")
+        orders = QueueOrderSerializer.setup_eager_loading(Order.objects.all())
+        # Waiters are woken by writes on the primary; a lagging replica would
+        # send them straight back with nothing new.
+        with use_primary():
+            if since is None:
+                # Clients page through with the Link header and keep the token
+                # from the first page; anything that changes meanwhile arrives
+                # with the first poll after it.
+                token = await aget_queue_position()
+                paginator = KeysetPaginator(perpage=get_perpage(request, default=20))
+                queue = await paginator.apaginate_queryset(open_orders(orders, request.user.id), request)
+                removed = []
+            else:
+                paginator = None
+                if await ais_token_expired(since):
+                    return Response({"since": "This token has expired; fetch the queue again without it."}, status=status.HTTP_410_GONE)
+                await await_queue_change(request.user.id, since, query.validated_data["wait"])
+                token, queue, removed = await aget_queue_changes(orders, request.user.id, since)
+        response = Response({
+            "token": token,
+            "orders": QueueOrderSerializer(queue, many=True).data,
+            "removed": removed,
+        }, status=status.HTTP_200_OK)
+        if paginator:
+            paginator.add_link_header(response, request)
+        return response
+
+@permission_classes([IsAuthenticated])
+class OrdersExport(APIView):
+
+    def perform_content_negotiation(self, request, force=False):
+        # The export streams its own content type; a text/csv Accept header
+        # must not be rejected by renderer negotiation.
+        return super().perform_content_negotiation(request, force=True)
+
+    @only_for([MANAGER_GROUP])
+    def get(self, request, format=None):
+        query = OrderExportFilter(request.query_params)
+        orders = query.filter_queryset(Order.objects.all())
+        output = request.query_params.get("output", "ndjson")
+        if output == "csv":
+            response = StreamingHttpResponse(stream_csv(orders), content_type="text/csv")
+            response["Content-Disposition"] = 'attachment; filename="orders.csv"'
+        elif output == "ndjson":
+            response = StreamingHttpResponse(stream_ndjson(orders), content_type="application/x-ndjson")
+        else:
+            raise ValidationError({"output": "Choose from: ndjson, csv."})
+        return response
+
+def order_validators(view, request, id, format=None):
+    updated_at = Order.objects.filter(id=id, user=request.user).values_list("updated_at", flat=True).first()
+    if updated_at is None:
+        return None
+    return make_etag("order", id, updated_at.isoformat()), updated_at
+
 @permission_classes([IsAuthenticated])
 class OrdersDetail(APIView):
     
-    def get_throttles(self):
-        if self.get:
-            return [UserRateThrottle()]
-        return []
+    throttle_classes = [FixedWindowScopedRateThrottle]
+    throttle_scope = "orders"
     
     @only_for([CUSTOMER_GROUP])
+    @conditional_response(order_validators)
     def get(self, request, id, format=None):
-        order = get_object_or_404(Order, id=id, user=request.user)
+        order = get_object_or_404(OrderSerializer.setup_eager_loading(Order.objects.all()), id=id, user=request.user)
         serialized_item = OrderSerializer(order)
         return Response(serialized_item.data, status=status.HTTP_200_OK)
     
     @only_for([MANAGER_GROUP])
     def put(self, request, id, format=None):
         order = get_object_or_404(Order, id=id)
+        delivery_crew_id, order_status = order.delivery_crew_id, order.status
         serialized_item = OrderSerializer(order, data=request.data)
         serialized_item.is_valid(raise_exception=True)
-        serialized_item.save()
+        with transaction.atomic():
+            serialized_item.save()
+            record_order_changed(order, delivery_crew_id, order_status)
+            record_order_queue_changes(order, delivery_crew_id, order_status)
+            publish_order_changes(order, delivery_crew_id, order_status)
         return Response(serialized_item.data, status=status.HTTP_200_OK)
 
     @only_for([MANAGER_GROUP, DELIVERY_CREW_GROUP])
     def patch(self, request, id, format=None):
         order = get_object_or_404(Order, id=id)
+        delivery_crew_id, order_status = order.delivery_crew_id, order.status
         user_group = get_group(request.user)
         data = {}
         if user_group == MANAGER_GROUP:
@@ -314,21 +450,32 @@ class OrdersDetail(APIView):
             data["status"] = request.data["status"]
         serialized_item = OrderSerializer(order, data=data)
         serialized_item.is_valid(raise_exception=True)
-        serialized_item.save()
+        with transaction.atomic():
+            serialized_item.save()
+            record_order_changed(order, delivery_crew_id, order_status)
+            record_order_queue_changes(order, delivery_crew_id, order_status)
+            publish_order_changes(order, delivery_crew_id, order_status)
         return Response(serialized_item.data, status=status.HTTP_200_OK)
     
     @only_for([MANAGER_GROUP])
     def delete(self, request, id, format=None):
         order = get_object_or_404(Order, id=id)
-        order.delete()
+        with transaction.atomic():
+            record_order_deleted(order, order.order_item.only("menuitem_id", "quantity", "price"))
+            record_order_queue_removed(order)
+            order.delete()
         return Response(status=status.HTTP_200_OK)
 
 @permission_classes([IsAuthenticated])
-class CategoriesList(APIView):
+class CategoriesList(AsyncAPIView):
     
     @only_for([MANAGER_GROUP, CUSTOMER_GROUP])
-    def get(self, request, format=None):
-        categories = get_list_or_404(Category)
+    @conditional_response(acatalogue_validators("categories"))
+    @cache_catalogue_response("categories")
+    async def get(self, request, format=None):
+        categories = [category async for category in Category.objects.all()]
+        if not categories:
+            raise Http404
         serialized_item = CategorySerializer(categories, many=True)
         return Response(serialized_item.data, status=status.HTTP_200_OK)
     
@@ -338,4 +485,58 @@ class CategoriesList(APIView):
         serialized_item.is_valid(raise_exception=True)
         serialized_item.save()
         return Response(serialized_item.data, status=status.HTTP_201_CREATED)
-    
\ No newline at end of file
+    
+@permission_classes([IsAuthenticated])
+class Metrics(APIView):
+
+    def perform_content_negotiation(self, request, force=False):
+        # Prometheus scrapers send their own Accept header for the text format.
+        return super().perform_content_negotiation(request, force=True)
+
+    @only_for([MANAGER_GROUP])
+    def get(self, request, format=None):
+        return HttpResponse(metrics_registry.render_prometheus(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+@permission_classes([IsAuthenticated])
+class SlowEndpoints(APIView):
+
+    @only_for([MANAGER_GROUP])
+    def get(self, request, format=None):
+        return Response(metrics_registry.slow_endpoints(), status=status.HTTP_200_OK)
+
+# The analytics views read the rollup tables kept current by .rollups, so
+# their cost depends on the date range asked for, not the order history.
+
+@permission_classes([IsAuthenticated])
+class RevenueAnalytics(APIView):
+
+    @only_for([MANAGER_GROUP])
+    def get(self, request, format=None):
+        query = AnalyticsFilter(request.query_params)
+        days = query.filter_queryset(DailyRevenue.objects.order_by("date"))
+        totals = days.aggregate(order_count=Sum("order_count"), revenue=Sum("revenue"))
+        summary = RevenueSummarySerializer({
+            "order_count": totals["order_count"] or 0,
+            "revenue": totals["revenue"] or 0,
+            "days": days,
+        })
+        return Response(summary.data, status=status.HTTP_200_OK)
+
+@permission_classes([IsAuthenticated])
+class MenuItemAnalytics(APIView):
+
+    @only_for([MANAGER_GROUP])
+    def get(self, request, format=None):
+        query = AnalyticsFilter(request.query_params)
+        sales = query.filter_queryset(DailyItemSales.objects.all()).values("menuitem").annotate(
+            title=F("menuitem__title"), units=Sum("units"), revenue=Sum("revenue")
+        ).order_by("-units", "menuitem")[:get_perpage(request, default=20)]
+        return Response(MenuItemSalesSerializer(sales, many=True).data, status=status.HTTP_200_OK)
+
+@permission_classes([IsAuthenticated])
+class CrewAnalytics(APIView):
+
+    @only_for([MANAGER_GROUP])
+    def get(self, request, format=None):
+        counts = CrewStatusCount.objects.filter(order_count__gt=0).select_related("delivery_crew").order_by("delivery_crew_id", "status")
+        return Response(CrewStatusCountSerializer(counts, many=True).data, status=status.HTTP_200_OK)